@@ -0,0 +1,99 @@
+"""
+Login throughput benchmark.
+
+Runs a burst of concurrent logins against the app for each password hashing
+pool size, while a probe keeps requesting a cheap page, and reports login
+throughput and the probe's latency.
+
+    python benchmarks/login.py --threads 8 --seconds 10
+
+A pool as large as the number of login threads behaves like hashing on
+the request threads. Runs on a temporary SQLite file.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flashlearn import create_app, db, passwords  # noqa: E402
+from flashlearn.models import User  # noqa: E402
+
+
+def login_loop(app, username, stop, logins):
+    client = app.test_client()
+    while not stop.is_set():
+        res = client.post(
+            "/user/login", data=dict(username=username, password="password")
+        )
+        assert res.status_code == 302, "Should log in"
+        logins.append(1)
+
+
+def probe_loop(app, stop, latencies):
+    client = app.test_client()
+    while not stop.is_set():
+        start = time.perf_counter()
+        client.get("/user/login")
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def run(app, pool_size, threads, seconds):
+    passwords.shutdown()
+    app.config["PASSWORD_HASH_WORKERS"] = pool_size
+    stop, logins, latencies = threading.Event(), [], []
+    workers = [
+        threading.Thread(target=login_loop, args=(app, f"bench{i}", stop, logins))
+        for i in range(threads)
+    ]
+    workers.append(threading.Thread(target=probe_loop, args=(app, stop, latencies)))
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    latencies.sort()
+    return (
+        len(logins) / seconds,
+        statistics.median(latencies),
+        latencies[int(len(latencies) * 0.95) - 1],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent logins")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--pool-sizes", default="1,2,4,8")
+    args = parser.parse_args()
+
+    app = create_app("testing")
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    app.config["BCRYPT_LOG_ROUNDS"] = args.rounds
+    with app.app_context():
+        db.create_all()
+        for i in range(args.threads):
+            user = User(username=f"bench{i}", password="password")
+            user.save()
+
+    print(
+        f"{args.threads} login threads, bcrypt cost {args.rounds},"
+        f" {os.cpu_count()} CPUs"
+    )
+    print(f"{'pool':>4}{'logins/s':>10}{'probe p50':>12}{'p95':>10}")
+    for pool_size in [int(size) for size in args.pool_sizes.split(",")]:
+        throughput, p50, p95 = run(app, pool_size, args.threads, args.seconds)
+        print(f"{pool_size:>4}{throughput:>10.1f}{p50:>10.1f}ms{p95:>8.1f}ms")
+    passwords.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Card search latency benchmark.
+
+Seeds a throwaway database with synthetic cards, then times full-text
+searches against the equivalent LIKE scan.
+
+    python benchmarks/search.py --cards 1000000
+
+Runs on a temporary SQLite file by default, set BENCH_DATABASE_URI to
+benchmark Postgres. Never point it at a database holding real data, it
+drops every table when done.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flashlearn import create_app, db  # noqa: E402
+from flashlearn.models import Card, Deck, User  # noqa: E402
+from flashlearn.search import search_cards  # noqa: E402
+
+INSERT_CHUNK_SIZE = 10000
+VOCABULARY_SIZE = 50000
+
+
+def seed(user_count, card_count, vocabulary, cum_weights):
+    users = []
+    for i in range(user_count):
+        user = User(username=f"bench{i}", email=f"bench{i}@example.com")
+        # Skip bcrypt, nobody logs in as these users
+        user.password = "bench"
+        user.save()
+        users.append((user.id, Deck.query.filter_by(user_id=user.id).first().id))
+    rows = []
+    for i in range(card_count):
+        user_id, deck_id = users[i % user_count]
+        rows.append(
+            dict(
+                front=" ".join(
+                    random.choices(vocabulary, cum_weights=cum_weights, k=6)
+                ),
+                back=" ".join(
+                    random.choices(vocabulary, cum_weights=cum_weights, k=40)
+                ),
+                user_id=user_id,
+                deck_id=deck_id,
+            )
+        )
+        if len(rows) == INSERT_CHUNK_SIZE:
+            db.session.execute(Card.__table__.insert(), rows)
+            db.session.commit()
+            rows = []
+    if rows:
+        db.session.execute(Card.__table__.insert(), rows)
+        db.session.commit()
+    return users[0][0]
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cards", type=int, default=1000000)
+    # 10 heavy users with 100k cards each by default
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    # Zipf distributed words, like natural text: the word of rank r is
+    # used with a frequency proportional to 1/r
+    vocabulary = [f"w{rank}" for rank in range(1, VOCABULARY_SIZE + 1)]
+    ranks = range(1, VOCABULARY_SIZE + 1)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in ranks))
+
+    app = create_app("testing")
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
+        "BENCH_DATABASE_URI", f"sqlite:///{path}"
+    )
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        user_id = seed(args.users, args.cards, vocabulary, cum_weights)
+        print(f"Seeded {args.cards} cards in {time.perf_counter() - start:.1f}s")
+
+        queries = {
+            # In almost every card, like a stop word
+            "top word": "w1",
+            "common word": "w100",
+            "rare word": "w10000",
+            "two words": "w100 w200",
+            "prefix": "w123",
+        }
+        print(f"{'query':<14}{'search p50':>12}{'p95':>10}{'LIKE p50':>12}")
+        for name, query in queries.items():
+            search = timed(lambda: search_cards(user_id, query), args.runs)
+            like = timed(
+                lambda: Card.query.filter(
+                    Card.user_id == user_id,
+                    Card.front.like(f"%{query}%") | Card.back.like(f"%{query}%"),
+                )
+                .limit(20)
+                .all(),
+                max(1, args.runs // 4),
+            )
+            print(
+                f"{name:<14}{search[0]:>10.1f}ms{search[1]:>8.1f}ms{like[0]:>10.1f}ms"
+            )
+        print("LIKE is unranked and stops at 20 matches, frequent words end early")
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ then
 fi
 
 python -m flask db upgrade
-gunicorn --bind 0.0.0.0:5000 wsgi:app
+# Threaded workers keep serving other requests while logins wait on the
+# password hashing pool, see PASSWORD_HASH_WORKERS
+gunicorn --bind 0.0.0.0:5000 \
+    --workers "${GUNICORN_WORKERS:-2}" \
+    --threads "${GUNICORN_THREADS:-4}" \
+    wsgi:app
 
 exec "$@"
@@ -6,6 +6,7 @@ from flask import Flask, redirect, url_for
 from logging.handlers import RotatingFileHandler
 from instance.config import app_config
 from flashlearn.decorators import login_required, redis_cache
+from flashlearn import query_stats
 
 session_options = {"expire_on_commit": False}
 db = SQLAlchemy(session_options=session_options)
@@ -38,6 +39,10 @@ def create_app(config=None):
     if not conf_mapping:
         raise ValueError("Invalid environment settings")
     app.config.from_object(conf_mapping)
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("postgres"):
+        # Batch executemany() into multi-row INSERTs, e.g for card imports
+        engine_options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        engine_options.setdefault("executemany_mode", "values")
 
     # Setup logging
     if not app.testing:
@@ -66,6 +71,8 @@ def create_app(config=None):
 
     db.init_app(app)
     csrf.init_app(app)
+    # Before the blueprints, to account for the queries of all their hooks
+    query_stats.init_app(app)
     # Commands and Blueprint registration needs to be after db init..
     register_blueprints_and_commands(app)
 
@@ -0,0 +1,226 @@
+"""
+Versioned cache namespaces.
+Every cached value of a user embeds the user's generation in its key, and
+values about a deck the deck's generation too. Incrementing a generation
+invalidates everything cached under it at once, without enumerating keys;
+entries of old generations are never read again and simply expire.
+"""
+import time
+from functools import wraps
+from flask import current_app, g, request
+from flashlearn.decorators import redis_cache
+
+# Recomputed for every response, or specific to one client
+UNCACHED_HEADERS = ("Content-Length", "Set-Cookie")
+# Seconds a request computing a missing response holds its key's lock, and
+# how often the requests waiting for it check whether it is cached
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+
+def generation_key(scope, id):
+    return f"gen:{scope}:{id}"
+
+
+def generations(*keys):
+    """
+    Current values of generation counters, missing ones are started.
+    A counter starts at the current time in milliseconds rather than 0, so a
+    counter lost from the cache can't come back to an older generation and
+    serve the values cached under it
+    :return: One generation per key
+    :rtype: list
+    """
+    values = redis_cache.get_many(*keys)
+    for i, (key, value) in enumerate(zip(keys, values)):
+        if value is None:
+            # Counters never expire, add() keeps a concurrently started one
+            redis_cache.add(key, int(time.time() * 1000), timeout=0)
+            values[i] = redis_cache.get(key)
+    return values
+
+
+def user_key(user_id, *parts):
+    """
+    Cache key of a value depending on any of a user's data
+    :param parts: Names the value within the namespace
+    :rtype: str
+    """
+    (user_generation,) = generations(generation_key("user", user_id))
+    return ":".join(map(str, ("user", user_id, user_generation, *parts)))
+
+
+def deck_key(user_id, deck_id, *parts):
+    """
+    Cache key of a value depending on a deck, its cards and study sessions.
+    It is invalidated by the deck's generation and the user's
+    :rtype: str
+    """
+    user_generation, deck_generation = generations(
+        generation_key("user", user_id), generation_key("deck", deck_id)
+    )
+    parts = ("user", user_id, user_generation, "deck", deck_id, deck_generation, *parts)
+    return ":".join(map(str, parts))
+
+
+def invalidate_user(user_id):
+    """
+    Invalidate everything cached for a user, e.g after decks were created,
+    moved or deleted
+    """
+    bump(generation_key("user", user_id))
+
+
+def invalidate_decks(*deck_ids):
+    """Invalidate what is cached about some decks, e.g after card changes"""
+    for deck_id in set(deck_ids):
+        bump(generation_key("deck", deck_id))
+
+
+def bump(key):
+    # inc() of a missing counter would start it at 1, an old generation
+    generations(key)
+    redis_cache.inc(key)
+
+
+def add_etag(response):
+    """
+    Add a strong ETag to a complete 200 response to a GET request. Other
+    requests are never answered 304 Not Modified, hashing them is wasted
+    """
+    if (
+        request.method in ("GET", "HEAD")
+        and response.status_code == 200
+        and not response.is_streamed
+    ):
+        response.add_etag()
+        # Browsers revalidate every time, and shared caches never store it
+        response.headers.setdefault("Cache-Control", "private, no-cache")
+    return response
+
+
+def etag(view):
+    """
+    Tag a view's GET responses with strong ETags, answering 304 Not Modified
+    to requests for a copy the client already has
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = add_etag(current_app.make_response(view(*args, **kwargs)))
+        return response.make_conditional(request)
+
+    return wrapper
+
+
+def cache_response(scope=None, methods=("GET", "POST"), stale_ttl=None):
+    """
+    Cache a view's JSON responses, with their status and headers, and tag
+    its GET responses with ETags, see etag().
+    Responses are keyed by user, endpoint, method, view args and query
+    string, in the user's namespace or in the deck's when scope is "deck".
+    Pages aren't stored as they embed the session's CSRF token. Concurrent
+    misses of a key are computed once, see fetch()
+    :param scope: None or "deck", the deck is the view's deck_id argument
+    :type scope: str | None
+    :param methods: Request methods whose responses are cached
+    :type methods: tuple
+    :param stale_ttl: Seconds a response is still served after it was
+        invalidated or expired, while it is being recomputed
+    :type stale_ttl: int | None
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # HEAD responses are GET responses without a body
+            method = "GET" if request.method == "HEAD" else request.method
+            if method not in methods:
+                response = add_etag(current_app.make_response(view(*args, **kwargs)))
+                return response.make_conditional(request)
+            parts = (
+                request.endpoint,
+                method,
+                *args,
+                *[f"{name}={value}" for name, value in sorted(kwargs.items())],
+                request.query_string.decode(),
+            )
+            if scope == "deck":
+                cached_key = deck_key(g.user.id, kwargs["deck_id"], *parts)
+                parts = ("deck", kwargs["deck_id"], *parts)
+            else:
+                cached_key = user_key(g.user.id, *parts)
+            # The same key in every generation
+            stale_key = ":".join(map(str, ("stale", "user", g.user.id, *parts)))
+            response = fetch(
+                cached_key,
+                lambda: add_etag(current_app.make_response(view(*args, **kwargs))),
+                stale_key=stale_key if stale_ttl else None,
+                stale_ttl=stale_ttl,
+            )
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
+
+
+def fetch(cached_key, compute, stale_key=None, stale_ttl=None):
+    """
+    A cached response, computing it on a miss.
+    Concurrent misses of a key are coalesced, the first request takes a lock
+    and computes the response while the others wait for it to be cached, or
+    get the last response cached under stale_key right away. A lock lasts
+    at most LOCK_TIMEOUT, in case its request died
+    :param compute: Returns the response to cache, only complete 200 JSON
+        responses are cached
+    :type compute: callable
+    :param stale_key: Key of the last cached response, None to always wait
+    :type stale_key: str | None
+    :param stale_ttl: Seconds the last response outlives the cache timeout
+    :type stale_ttl: int | None
+    :rtype: flask.Response
+    """
+    cached = redis_cache.get(cached_key)
+    if cached is not None:
+        return deserialize_response(cached)
+    lock_key = f"lock:{cached_key}"
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not redis_cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        if stale_key is not None:
+            stale = redis_cache.get(stale_key)
+            if stale is not None:
+                return deserialize_response(stale)
+        time.sleep(LOCK_POLL_INTERVAL)
+        cached = redis_cache.get(cached_key)
+        if cached is not None:
+            return deserialize_response(cached)
+        if time.monotonic() > deadline:
+            break
+    try:
+        response = compute()
+        if response.status_code == 200 and response.is_json:
+            data = serialize_response(response)
+            redis_cache.set(cached_key, data)
+            if stale_key is not None:
+                redis_cache.set(
+                    stale_key, data, timeout=redis_cache.default_timeout + stale_ttl
+                )
+    finally:
+        redis_cache.delete(lock_key)
+    return response
+
+
+def serialize_response(response):
+    headers = [
+        (name, value)
+        for name, value in response.headers
+        if name not in UNCACHED_HEADERS
+    ]
+    return dict(body=response.get_data(), status=response.status_code, headers=headers)
+
+
+def deserialize_response(data):
+    return current_app.response_class(
+        data["body"], status=data["status"], headers=data["headers"]
+    )
@@ -0,0 +1,661 @@
+"""
+Cache backends.
+TieredCache answers from a bounded in-process LRUCache first and falls back
+to Redis, so hot keys such as generation counters and cached deck views
+don't cost a round trip. Writes go to both tiers and are broadcast over
+Redis pub/sub, every process then drops its local copy of the key.
+SQLiteCache is shared by the processes of one host through a SQLite file
+instead, for deployments without Redis.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask_caching.backends.base import BaseCache
+
+logger = logging.getLogger(__name__)
+# Returned by CircuitBreaker.call when the backend was not, or could not be,
+# called
+UNAVAILABLE = object()
+
+
+class LRUCache(BaseCache):
+    """
+    Thread-safe in-process cache, evicting the least recently used entries
+    beyond max_bytes of pickled values.
+    Values are pickled like SimpleCache's, callers never share mutable
+    objects
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, default_timeout=30):
+        super().__init__(default_timeout)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key: (expires, pickled value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _normalize_timeout(self, timeout):
+        timeout = super()._normalize_timeout(timeout)
+        if timeout > 0:
+            timeout = time.time() + timeout
+        return timeout
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] == 0 or entry[0] > time.time()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(entry[1])
+            self._pop(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, value, timeout=None):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self._normalize_timeout(timeout)
+        with self._lock:
+            return self._store(key, expires, data)
+
+    def _store(self, key, expires, data):
+        self._pop(key)
+        if len(data) > self.max_bytes:
+            return False
+        self._entries[key] = (expires, data)
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+        return True
+
+    def add(self, key, value, timeout=None):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self._normalize_timeout(timeout)
+        # Checked and set under one lock, add() can be used as a lock itself
+        with self._lock:
+            if self._live(key):
+                return False
+            return self._store(key, expires, data)
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and (entry[0] == 0 or entry[0] > time.time())
+
+    def has(self, key):
+        with self._lock:
+            return self._live(key)
+
+    def delete(self, key):
+        with self._lock:
+            return self._pop(key) is not None
+
+    def delete_many(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+        return True
+
+    def inc(self, key, delta=1):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or 0 < entry[0] <= time.time():
+                entry = (0, pickle.dumps(0))
+            expires, value = entry[0], pickle.loads(entry[1])
+            self._store(key, expires, pickle.dumps(value + delta))
+        return value + delta
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+        return True
+
+    def stats(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            entries=len(self._entries),
+            bytes=self.size,
+        )
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing backend.
+    After max_failures consecutive errors the circuit opens and calls fail
+    fast for reset_timeout seconds. A single trial call then closes it
+    again if it succeeds, or keeps it open for another reset_timeout
+    :param errors: Exception types counted as failures, others propagate
+    :type errors: tuple
+    """
+
+    def __init__(self, max_failures=5, reset_timeout=30, errors=(Exception,)):
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.errors = errors
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def call(self, fn, *args):
+        """
+        fn(*args), or UNAVAILABLE if the circuit is open or the call failed
+        """
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self._trial):
+                return UNAVAILABLE
+            self._trial = state == "half-open"
+        try:
+            result = fn(*args)
+        except self.errors as e:
+            with self._lock:
+                self._trial = False
+                self.failures += 1
+                if self.opened_at is not None or self.failures >= self.max_failures:
+                    if self.state != "open":
+                        logger.warning("Cache circuit opened: %s", e)
+                    self.opened_at = time.monotonic()
+            return UNAVAILABLE
+        with self._lock:
+            if self.opened_at is not None:
+                logger.warning("Cache circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+        return result
+
+
+class TieredCache(BaseCache):
+    """
+    An LRUCache in front of a shared cache, usually Redis.
+    Local copies live at most the local cache's default timeout, which
+    bounds how stale a value can get if an invalidation message is lost, or
+    without a shared tier how stale other processes' copies get.
+    Calls to the shared cache go through a circuit breaker. While it is
+    open the local tier serves alone, and the keys written meanwhile are
+    deleted from the shared cache once it is reachable again
+    :param local: The in-process tier
+    :type local: LRUCache
+    :param remote: The shared tier, None for the local tier only e.g in tests
+    :type remote: BaseCache | None
+    :param client: Redis client to broadcast invalidations with
+    :type client: redis.Redis | None
+    :type breaker: CircuitBreaker | None
+    """
+
+    # Past this many keys written while the shared cache was unreachable, it
+    # is cleared instead once it is back
+    MAX_PENDING = 10000
+
+    def __init__(
+        self, local, remote=None, client=None, channel="cache:invalidate", breaker=None
+    ):
+        super().__init__(remote.default_timeout if remote else local.default_timeout)
+        self.local = local
+        self.remote = remote
+        self.client = client
+        self.channel = channel
+        self.breaker = breaker or CircuitBreaker()
+        self.hits = 0
+        self.misses = 0
+        self._pid = None
+        self._sender = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def local_timeout(self, timeout):
+        """The local tier's timeout for a value stored for `timeout` seconds"""
+        timeout = self._normalize_timeout(timeout)
+        if timeout > 0:
+            return min(timeout, self.local.default_timeout)
+        # Values that never expire, e.g generation counters, are only kept
+        # for good when there's no shared copy to read again
+        return 0 if self.remote is None else None
+
+    def listen(self):
+        """
+        Subscribe to invalidations in a daemon thread, once per process as
+        gunicorn forks its workers after the cache is created
+        """
+        if self.client is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._sender = f"{self._pid}-{uuid.uuid4().hex}"
+                # Copied from the parent before forking
+                self.local.clear()
+                threading.Thread(
+                    target=self.subscribe, name="cache-invalidation", daemon=True
+                ).start()
+
+    def subscribe(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Invalidations were missed while not subscribed
+                self.local.clear()
+                while True:
+                    # Waits on the socket, unlike listen() which would time
+                    # out after the client's socket_timeout
+                    message = pubsub.get_message(timeout=1)
+                    if message is not None:
+                        self.invalidate(message["data"].decode())
+            except Exception as e:
+                logger.warning("Cache invalidation subscription failed: %s", e)
+                time.sleep(1)
+
+    def invalidate(self, message):
+        """Drop the local copy of the key in an invalidation message"""
+        sender, _, key = message.partition(" ")
+        if sender == self._sender:
+            return
+        if key == "*":
+            self.local.clear()
+        else:
+            self.local.delete(key)
+
+    def publish(self, *keys):
+        """Make the other processes drop their local copy of keys"""
+        if self.client is None:
+            return
+        if self.breaker.call(self._publish, keys) is UNAVAILABLE:
+            self.defer(*keys)
+
+    def _publish(self, keys):
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.publish(self.channel, f"{self._sender} {key}")
+        pipeline.execute()
+
+    def call(self, method, *args):
+        """
+        A method of the shared cache, UNAVAILABLE while it is failing
+        :param method: Name of the method
+        :type method: str
+        """
+        result = self.breaker.call(getattr(self.remote, method), *args)
+        if result is not UNAVAILABLE and self._pending:
+            self.replay()
+        return result
+
+    def defer(self, *keys):
+        """Invalidate keys in the shared cache once it is reachable again"""
+        with self._pending_lock:
+            self._pending.update(keys)
+            if len(self._pending) > self.MAX_PENDING:
+                self._pending = {"*"}
+
+    def replay(self):
+        with self._pending_lock:
+            keys, self._pending = self._pending, set()
+        if "*" in keys:
+            result = self.breaker.call(self.remote.clear)
+        else:
+            result = self.breaker.call(self.remote.delete_many, *keys)
+        if result is UNAVAILABLE:
+            self.defer(*keys)
+        else:
+            self.publish(*keys)
+
+    def get(self, key):
+        return self.get_many(key)[0]
+
+    def get_many(self, *keys):
+        self.listen()
+        values = self.local.get_many(*keys)
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing or self.remote is None:
+            return values
+        remote_values = self.call("get_many", *[keys[i] for i in missing])
+        if remote_values is UNAVAILABLE:
+            remote_values = [None] * len(missing)
+        for i, value in zip(missing, remote_values):
+            if value is None:
+                self.misses += 1
+                continue
+            self.hits += 1
+            values[i] = value
+            self.local.set(keys[i], value)
+        return values
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def set(self, key, value, timeout=None):
+        self.listen()
+        if self.remote is not None:
+            stored = self.call("set", key, value, timeout)
+            if stored is UNAVAILABLE:
+                self.defer(key)
+            elif not stored:
+                return False
+            else:
+                self.publish(key)
+        return self.local.set(key, value, self.local_timeout(timeout))
+
+    def add(self, key, value, timeout=None):
+        self.listen()
+        if self.remote is None:
+            return self.local.add(key, value, timeout)
+        # Other processes can't hold a copy of a key that didn't exist
+        added = self.call("add", key, value, timeout)
+        if added is UNAVAILABLE:
+            return self.local.add(key, value, self.local_timeout(timeout))
+        if added:
+            self.local.set(key, value, self.local_timeout(timeout))
+        return added
+
+    def delete(self, key):
+        return self.delete_many(key)
+
+    def delete_many(self, *keys):
+        self.listen()
+        self.local.delete_many(*keys)
+        if self.remote is None:
+            return True
+        deleted = self.call("delete_many", *keys)
+        if deleted is UNAVAILABLE:
+            self.defer(*keys)
+            return True
+        self.publish(*keys)
+        return deleted
+
+    def inc(self, key, delta=1):
+        self.listen()
+        if self.remote is None:
+            return self.local.inc(key, delta)
+        value = self.call("inc", key, delta)
+        if value is UNAVAILABLE:
+            self.defer(key)
+            return self.local.inc(key, delta)
+        self.local.delete(key)
+        self.publish(key)
+        return value
+
+    def clear(self):
+        self.listen()
+        self.local.clear()
+        if self.remote is None:
+            return True
+        cleared = self.call("clear")
+        if cleared is UNAVAILABLE:
+            self.defer("*")
+            return True
+        self.publish("*")
+        return cleared
+
+    def stats(self):
+        """Hit and miss counters of each tier, for this process"""
+        return dict(
+            local=self.local.stats(),
+            remote=dict(hits=self.hits, misses=self.misses, state=self.breaker.state),
+        )
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache shared by every process of a host, stored in a SQLite database in
+    WAL mode so readers never wait for writers. Each statement is atomic,
+    a value written or deleted by one worker is seen by all the others.
+    Entries beyond max_bytes are evicted least recently used first, every
+    EVICT_EVERY writes of a process
+    :param path: The database file, preferably on a local disk
+    :type path: str
+    """
+
+    EVICT_EVERY = 64
+    # Reads refresh an entry's access time at most this often, in seconds,
+    # so that hot keys don't turn every read into a write
+    TOUCH_INTERVAL = 5
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS cache ("
+        " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+        " expires REAL NOT NULL, accessed REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)",
+    )
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, default_timeout=300):
+        super().__init__(default_timeout)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """This thread's connection, connections are not shared after forking"""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Autocommit, transactions are started explicitly
+            local.connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                local.connection.execute(statement)
+            local.pid = os.getpid()
+        return local.connection
+
+    def _normalize_timeout(self, timeout):
+        timeout = super()._normalize_timeout(timeout)
+        if timeout > 0:
+            timeout = time.time() + timeout
+        return timeout
+
+    def get(self, key):
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT value, accessed FROM cache"
+            " WHERE key = ? AND (expires = 0 OR expires > ?)",
+            (key, now),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if now - row[1] > self.TOUCH_INTERVAL:
+            self.connection.execute(
+                "UPDATE cache SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return pickle.loads(row[0])
+
+    def get_many(self, *keys):
+        """Values of several keys in one query, without refreshing access times"""
+        rows = dict(
+            self.connection.execute(
+                "SELECT key, value FROM cache"
+                f" WHERE key IN ({', '.join('?' * len(keys))})"
+                " AND (expires = 0 OR expires > ?)",
+                (*keys, time.time()),
+            )
+        )
+        self.hits += len(rows)
+        self.misses += len(keys) - len(rows)
+        return [pickle.loads(rows[key]) if key in rows else None for key in keys]
+
+    def has(self, key):
+        row = self.connection.execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires = 0 OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def _write(self, sql, key, value, timeout):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        cursor = self.connection.execute(
+            sql, (key, data, len(data), self._normalize_timeout(timeout), time.time())
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+        return cursor.rowcount > 0
+
+    def set(self, key, value, timeout=None):
+        return self._write(
+            "INSERT OR REPLACE INTO cache (key, value, size, expires, accessed)"
+            " VALUES (?, ?, ?, ?, ?)",
+            key,
+            value,
+            timeout,
+        )
+
+    def add(self, key, value, timeout=None):
+        # Takes the place of an expired entry, but not of a live one
+        return self._write(
+            "INSERT INTO cache (key, value, size, expires, accessed)"
+            " VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET value = excluded.value,"
+            " size = excluded.size, expires = excluded.expires,"
+            " accessed = excluded.accessed"
+            " WHERE cache.expires != 0 AND cache.expires <= excluded.accessed",
+            key,
+            value,
+            timeout,
+        )
+
+    def delete(self, key):
+        cursor = self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, *keys):
+        self.connection.executemany(
+            "DELETE FROM cache WHERE key = ?", [(key,) for key in keys]
+        )
+        return True
+
+    def inc(self, key, delta=1):
+        connection = self.connection
+        # Holds the write lock between reading and writing the value
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value, expires FROM cache"
+                " WHERE key = ? AND (expires = 0 OR expires > ?)",
+                (key, time.time()),
+            ).fetchone()
+            value = (pickle.loads(row[0]) if row else 0) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), row[1] if row else 0, time.time()),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return value
+
+    def clear(self):
+        self.connection.execute("DELETE FROM cache")
+        return True
+
+    def evict(self):
+        """Delete expired entries, then the least recently used over max_bytes"""
+        connection = self.connection
+        connection.execute(
+            "DELETE FROM cache WHERE expires != 0 AND expires <= ?", (time.time(),)
+        )
+        connection.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total"
+            "  FROM cache"
+            " ) WHERE total > ?"
+            ")",
+            (self.max_bytes,),
+        )
+
+    def stats(self):
+        """Hit and miss counters of this process, entries of the whole cache"""
+        entries, size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        return dict(
+            shared=dict(hits=self.hits, misses=self.misses, entries=entries, bytes=size)
+        )
+
+
+def from_config(config):
+    """
+    The cache configured in instance/config.py: Redis behind an in-process
+    tier when USE_REDIS_CACHE, else a SQLite file shared by the host's
+    workers when SHARED_CACHE_PATH is set, else a short lived cache per
+    process
+    """
+    local = LRUCache(
+        max_bytes=config.LOCAL_CACHE_MAX_BYTES,
+        default_timeout=config.LOCAL_CACHE_TIMEOUT,
+    )
+    if config.USE_REDIS_CACHE:
+        import redis
+        from flask_caching.backends import RedisCache
+
+        # Requests wait at most REDIS_POOL_TIMEOUT for a free connection
+        pool = redis.BlockingConnectionPool.from_url(
+            config.REDIS_URL,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            timeout=config.REDIS_POOL_TIMEOUT,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_SOCKET_CONNECT_TIMEOUT,
+        )
+        client = redis.Redis(connection_pool=pool)
+        remote = RedisCache(
+            host=client,
+            default_timeout=config.CACHE_DEFAULT_TIMEOUT,
+            key_prefix=config.CACHE_KEY_PREFIX,
+        )
+        breaker = CircuitBreaker(
+            max_failures=config.CACHE_CIRCUIT_MAX_FAILURES,
+            reset_timeout=config.CACHE_CIRCUIT_RESET_TIMEOUT,
+            errors=(redis.RedisError,),
+        )
+        return TieredCache(
+            local,
+            remote,
+            client=client,
+            channel=f"{config.CACHE_KEY_PREFIX}cache:invalidate",
+            breaker=breaker,
+        )
+    if config.SHARED_CACHE_PATH:
+        # Shared by the workers of the host, local copies would go stale
+        return SQLiteCache(
+            config.SHARED_CACHE_PATH,
+            max_bytes=config.SHARED_CACHE_MAX_BYTES,
+            default_timeout=config.CACHE_DEFAULT_TIMEOUT,
+        )
+    # Invalidations only reach the process making them
+    return TieredCache(
+        LRUCache(
+            max_bytes=config.LOCAL_CACHE_MAX_BYTES,
+            default_timeout=config.LOCAL_ONLY_CACHE_TIMEOUT,
+        )
+    )
@@ -1,3 +1,4 @@
+import time
 import click
 from flask_migrate import Migrate, MigrateCommand
 from flask.cli import with_appcontext
@@ -62,6 +63,51 @@ def create_user_command():
         click.echo("Username not available. Try again with a different one.")
 
 
+@click.command("rebuild-deck-stats")
+@with_appcontext
+def rebuild_deck_stats_command():
+    """Recompute the denormalized deck_stats table from scratch"""
+
+    from flashlearn.models import DeckStats
+
+    count = DeckStats.rebuild()
+    db.session.commit()
+    click.echo(f"Rebuilt stats for {count} decks.")
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index_command():
+    """Reindex every card for full-text search"""
+
+    from flashlearn.search import rebuild_search_index
+
+    rebuild_search_index()
+    click.echo("Rebuilt the card search index.")
+
+
+@click.command("import-worker")
+@click.option("--once", is_flag=True, help="Exit once there are no pending jobs.")
+@with_appcontext
+def import_worker_command(once):
+    """Process pending CSV/TSV card import jobs"""
+
+    from flask import current_app
+    from flashlearn.importer import run_import_job
+    from flashlearn.models import ImportJob
+
+    click.echo("Waiting for import jobs.")
+    while True:
+        job = ImportJob.claim_next()
+        if job is not None:
+            run_import_job(job)
+            click.echo(f"Import job {job.id}: {job.state}, {job.imported} cards.")
+        elif once:
+            break
+        else:
+            time.sleep(current_app.config["IMPORT_WORKER_POLL_INTERVAL"])
+
+
 def register_commands(app):
     """
     Registers custom CLI commands via click withing the app context..
@@ -73,3 +119,6 @@ def register_commands(app):
     app.cli.add_command(init_db_command)
     app.cli.add_command(drop_all_command)
     app.cli.add_command(create_user_command)
+    app.cli.add_command(rebuild_deck_stats_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(import_worker_command)
@@ -1,16 +1,33 @@
 import json
-from flask import request, jsonify, g, abort, render_template, session
+import os
+import uuid
+from flask import (
+    request,
+    jsonify,
+    g,
+    abort,
+    render_template,
+    session,
+    current_app,
+    Response,
+    stream_with_context,
+)
 from sqlalchemy import or_
 from flashlearn.core import core
-from flashlearn.models import Card, Deck, StudyPlan, StudySession, StudySessionLog
-from flashlearn.decorators import login_required, cache
-from flashlearn.enums import OrderTypeEnum
-from flashlearn.utils import to_bool
+from flashlearn.models import Card, Deck, ImportJob, StudyPlan, StudySession
+from flashlearn.cache import cache_response, etag, invalidate_decks, invalidate_user
+from flashlearn.decorators import login_required, super_user_required
+from flashlearn.enums import OrderTypeEnum, StudyTypeEnum
+from flashlearn.exporter import EXPORT_FORMATS, export_cards
+from flashlearn.importer import import_cards, iter_json_array, iter_ndjson
+from flashlearn.search import search_cards
+from flashlearn.utils import parse_datetime, to_bool
 from flashlearn import db, redis_cache
 
 
 @core.route("/card/<int:card_id>")
 @login_required
+@etag
 def get_card(card_id):
     target_card = Card.get_by_user_or_404(card_id, g.user.id)
     return jsonify(target_card.to_json)
@@ -47,8 +64,7 @@ def create_card():
                 state="Active",
             )
             new_card.save()
-            redis_cache.delete(f"user:{g.user.id}all_cards_dt")
-            redis_cache.delete(f"user:{g.user.id}deck_id:{deck_id}")
+            invalidate_decks(deck_id)
             return jsonify("Success")
         return jsonify(error)
 
@@ -56,22 +72,124 @@ def create_card():
 @core.route("/card/bulk/add/<int:deck_id>", methods=("POST",))
 @login_required
 def bulk_add_cards(deck_id):
+    deck = Deck.get_by_user_or_404(deck_id, g.user.id)
     data = json.loads(request.form.get("data"))
-    insert_cards = []
-    for card in data:
-        insert_cards.append(
-            Card(
-                front=card["front"],
-                back=card["back"],
-                deck_id=deck_id,
-                user_id=g.user.id,
-            )
+    for progress in import_cards(data, deck.id, g.user.id):
+        pass
+    invalidate_decks(deck_id)
+    if progress["failed"]:
+        return jsonify(
+            {"status": 0, "message": "Some cards could not be added", **progress}
         )
-    db.session.bulk_save_objects(insert_cards)
-    db.session.commit()
-    redis_cache.delete(f"user:{g.user.id}all_cards_dt")
-    redis_cache.delete(f"user:{g.user.id}deck_id:{deck_id}")
-    return jsonify({"status": 1, "message": "Cards added successfully"})
+    return jsonify({"status": 1, "message": "Cards added successfully", **progress})
+
+
+@core.route("/deck/<int:deck_id>/import", methods=("POST",))
+@login_required
+def import_deck_cards(deck_id):
+    """
+    Import cards from a JSON array or NDJSON (application/x-ndjson) request
+    body. The body is parsed and inserted incrementally, and the response
+    streams one NDJSON progress line per inserted chunk. Malformed NDJSON
+    lines stop the import and are reported in the progress.
+    """
+    deck = Deck.get_by_user_or_404(deck_id, g.user.id)
+    ndjson = request.mimetype in ("application/x-ndjson", "application/jsonl")
+    if ndjson:
+        items = iter_ndjson(request.stream)
+    else:
+        items = iter_json_array(request.stream)
+    progress = import_cards(items, deck.id, g.user.id, strict=not ndjson)
+    try:
+        # Parsed up to the first chunk, so a malformed JSON array is rejected
+        # before any card is inserted, like json.loads() would
+        first = next(progress)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"status": 0, "message": str(e)}), 400
+
+    def generate():
+        yield json.dumps(first) + "\n"
+        for chunk_progress in progress:
+            yield json.dumps(chunk_progress) + "\n"
+        invalidate_decks(deck_id)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@core.route("/deck/<int:deck_id>/import/file", methods=("POST",))
+@login_required
+def import_deck_file(deck_id):
+    """
+    Queue a CSV/TSV file import for the import worker.
+    Columns are given by header name or 0-based index, the optional
+    deck_column holds the name of the sub deck each card goes to.
+    """
+    deck = Deck.get_by_user_or_404(deck_id, g.user.id)
+    upload = request.files.get("file")
+    delimiter = {"csv": ",", "tsv": "\t"}.get(request.form.get("format", "csv"))
+    if upload is None or delimiter is None:
+        abort(400)
+    os.makedirs(current_app.config["IMPORT_FOLDER"], exist_ok=True)
+    file_path = os.path.join(current_app.config["IMPORT_FOLDER"], uuid.uuid4().hex)
+    upload.save(file_path)
+    job = ImportJob(
+        user_id=g.user.id,
+        deck_id=deck.id,
+        file_path=file_path,
+        delimiter=delimiter,
+        front_column=request.form.get("front_column") or "0",
+        back_column=request.form.get("back_column") or "1",
+        deck_column=request.form.get("deck_column") or None,
+        has_header=to_bool(request.form.get("has_header", False)),
+        state="Pending",
+    )
+    job.save()
+    return jsonify({"status": 1, "message": "Import queued", "job": job.to_json}), 202
+
+
+@core.route("/import/<int:job_id>")
+@login_required
+def get_import_job(job_id):
+    job = ImportJob.get_by_user_or_404(job_id, g.user.id)
+    return jsonify(job.to_json)
+
+
+def export_response(name, deck_ids=None):
+    """
+    Stream the user's cards as an attachment, in the format given by the
+    `format` arg (ndjson or csv), gzipped when the `gzip` arg is true
+    """
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    compress = to_bool(request.args.get("gzip", False))
+    filename = f"{name}.{fmt}.gz" if compress else f"{name}.{fmt}"
+    chunks = export_cards(g.user.id, fmt, deck_ids=deck_ids, compress=compress)
+    return Response(
+        stream_with_context(chunks),
+        mimetype="application/gzip" if compress else EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@core.route("/deck/<int:deck_id>/export")
+@login_required
+def export_deck(deck_id):
+    """Export a deck's cards, and its sub decks' unless recursive is false"""
+    deck = Deck.get_by_user_or_404(deck_id, g.user.id)
+    if to_bool(request.args.get("recursive", True)):
+        deck_ids = Deck.subtree_ids([deck.id])
+    else:
+        deck_ids = [deck.id]
+    return export_response(f"deck-{deck.id}", deck_ids)
+
+
+@core.route("/export")
+@login_required
+def export_account():
+    """Export all of the user's cards"""
+    return export_response(f"{g.user.username}-cards")
 
 
 @core.route("/card/<int:card_id>/edit", methods=("POST",))
@@ -82,14 +200,23 @@ def edit_card(card_id):
         state = request.form.get("state", card.state)
         if state not in ("Active", "Disabled"):
             abort(400)
+        deck_id = card.deck_id
+        if "deck_id" in request.form:
+            try:
+                deck_id = int(request.form["deck_id"])
+            except ValueError:
+                abort(400)
+            # Cards can only be moved to the user's own decks
+            deck_id = Deck.get_by_user_or_404(deck_id, g.user.id).id
+        previous_deck_id = card.deck_id
         card.update(
             front=request.form.get("front", card.front),
             back=request.form.get("back", card.back),
-            deck_id=request.form.get("deck_id", card.deck_id),
+            deck_id=deck_id,
             state=state,
         )
-        redis_cache.delete(f"user:{g.user.id}all_cards_dt")
-        redis_cache.delete(f"user:{g.user.id}deck_id:{card.deck_id}")
+        # A moved card changes both decks
+        invalidate_decks(previous_deck_id, card.deck_id)
         return jsonify("OK")
 
 
@@ -99,8 +226,7 @@ def delete_card(card_id):
     if request.method == "POST":
         card = Card.get_by_user_or_404(card_id, g.user.id)
         card.delete()
-        redis_cache.delete(f"user:{g.user.id}all_cards_dt")
-        redis_cache.delete(f"user:{g.user.id}deck_id:{card.deck_id}")
+        invalidate_decks(card.deck_id)
         return jsonify({"status": 1, "message": "Card deleted successfully"})
 
 
@@ -109,24 +235,135 @@ def delete_card(card_id):
 def bulk_delete_cards():
     """Bulk delete cards"""
     if request.method == "POST":
-        data = json.loads(request.form.get("data", []))
-        for card_id in data:
-            card = Card.get_by_user_or_404(card_id, g.user.id)
-            card.delete()
-            redis_cache.delete(f"user:{g.user.id}all_cards_dt")
-            redis_cache.delete(f"user:{g.user.id}deck_id:{card.deck_id}")
-        return jsonify({"status": 1, "message": "Cards deleted successfully"})
+        data = json.loads(request.form.get("data", "[]"))
+        card_ids = {int(card_id) for card_id in data if str(card_id).isdigit()}
+        deleted, deck_ids = Card.bulk_delete(card_ids, g.user.id)
+        invalidate_decks(*deck_ids)
+        return jsonify(
+            {
+                "status": 1,
+                "message": "Cards deleted successfully",
+                "deleted": deleted,
+                "rejected": len(set(map(str, data))) - deleted,
+            }
+        )
 
 
 @core.route("/cards")
 @login_required
 def cards():
-    if request.method == "GET":
-        all_cards = redis_cache.get(f"user:{g.user.id}all_cards_dt")
-        if all_cards is None:
-            all_cards = Card.query.filter_by(user_id=g.user.id)
-            redis_cache.set(f"user:{g.user.id}all_cards_dt", all_cards.all())
-        return render_template("dashboard/cards/_cards.html", cards=all_cards)
+    """The cards page, its rows are loaded from /cards/page"""
+    return render_template(
+        "dashboard/cards/_cards.html",
+        page_size=current_app.config["CARDS_PAGE_SIZE"],
+    )
+
+
+@core.route("/cards/page")
+@login_required
+def cards_page():
+    """
+    A page of the user's cards, newest first, optionally filtered by
+    deck_id and state. Pass the returned next_cursor as `cursor` to get
+    the next page.
+    """
+    limit = request.args.get("limit", current_app.config["CARDS_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, current_app.config["CARDS_PAGE_SIZE_MAX"]))
+    try:
+        rows, next_cursor = Card.page(
+            g.user.id,
+            deck_id=request.args.get("deck_id", None, type=int),
+            state=request.args.get("state", None),
+            cursor=request.args.get("cursor", None),
+            limit=limit,
+        )
+    except ValueError:
+        abort(400)
+    return jsonify(
+        {
+            "cards": [
+                dict(
+                    id=row.id,
+                    short_front=row.short_front,
+                    state=row.state,
+                    deck_id=row.deck_id,
+                    deck_name=row.deck_name,
+                    date_created=row.date_created,
+                )
+                for row in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@core.route("/cards/search")
+@login_required
+def cards_search():
+    """
+    Full-text search of the user's cards fronts and backs, best matches
+    first. Paginated with the `page` and `per_page` args.
+    """
+    page = max(1, request.args.get("page", 1, type=int))
+    per_page = request.args.get(
+        "per_page", current_app.config["CARDS_PAGE_SIZE"], type=int
+    )
+    per_page = max(1, min(per_page, current_app.config["CARDS_PAGE_SIZE_MAX"]))
+    rows, has_next = search_cards(
+        g.user.id, request.args.get("q", ""), page=page, per_page=per_page
+    )
+    return jsonify(
+        {
+            "cards": [
+                dict(
+                    id=row.id,
+                    short_front=row.short_front,
+                    state=row.state,
+                    deck_id=row.deck_id,
+                    deck_name=row.deck_name,
+                    rank=row.rank,
+                )
+                for row in rows
+            ],
+            "page": page,
+            "has_next": has_next,
+        }
+    )
+
+
+@core.route("/cards/due")
+@login_required
+def due_cards():
+    """
+    A page of the cards due for review, most overdue first, optionally
+    limited to a deck. Paginated like /cards/page.
+    """
+    limit = request.args.get("limit", current_app.config["CARDS_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, current_app.config["CARDS_PAGE_SIZE_MAX"]))
+    try:
+        rows, next_cursor = Card.due_page(
+            g.user.id,
+            deck_id=request.args.get("deck_id", None, type=int),
+            cursor=request.args.get("cursor", None),
+            limit=limit,
+        )
+    except ValueError:
+        abort(400)
+    return jsonify(
+        {
+            "cards": [
+                dict(
+                    id=row.id,
+                    short_front=row.short_front,
+                    deck_id=row.deck_id,
+                    deck_name=row.deck_name,
+                    next_review_at=row.next_review_at,
+                )
+                for row in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @core.route("/deck", methods=("POST", "GET"))
@@ -143,13 +380,13 @@ def create_deck():
             state="New",
         )
         deck.save()
-        redis_cache.delete(f"user:{g.user.id}all_decks_dt")
+        invalidate_user(g.user.id)
         return jsonify("Success")
 
 
 @core.route("/deck/<int:deck_id>", methods=("POST", "GET"))
 @login_required
-@cache
+@cache_response("deck", methods=("POST",), stale_ttl=30)
 def get_deck(deck_id):
     deck = Deck.get_by_user_or_404(deck_id, g.user.id)
     if request.method == "GET":
@@ -158,17 +395,29 @@ def get_deck(deck_id):
         return jsonify(deck.to_json)
 
 
+@core.route("/deck/<int:deck_id>/json")
+@login_required
+@cache_response("deck", stale_ttl=30)
+def get_deck_json(deck_id):
+    """The deck's JSON as a GET, which clients can revalidate with its ETag"""
+    deck = Deck.get_by_user_or_404(deck_id, g.user.id)
+    return jsonify(deck.to_json)
+
+
 @core.route("/deck/<int:deck_id>/edit", methods=("POST",))
 @login_required
 def edit_deck(deck_id):
     deck = Deck.get_by_user_or_404(deck_id, g.user.id)
-    deck.update(
-        name=request.form.get("name", deck.name),
-        description=request.form.get("description", deck.description),
-        parent_id=request.form.get("parent_id", deck.parent_id),
-    )
-    redis_cache.delete(f"user:{g.user.id}all_decks_dt")
-    redis_cache.delete(f"user:{g.user.id}deck_id:{deck_id}")
+    try:
+        deck.update(
+            name=request.form.get("name", deck.name),
+            description=request.form.get("description", deck.description),
+            parent_id=request.form.get("parent_id", deck.parent_id),
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"status": 0, "message": str(e)}), 400
+    invalidate_user(g.user.id)
     return jsonify("Success")
 
 
@@ -176,10 +425,9 @@ def edit_deck(deck_id):
 @login_required
 def delete_deck(deck_id):
     if request.method == "POST":
-        deck = Deck.query.get_or_404(deck_id)
+        deck = Deck.get_by_user_or_404(deck_id, g.user.id)
         deck.delete()
-        redis_cache.delete(f"user:{g.user.id}all_decks_dt")
-        redis_cache.delete(f"user:{g.user.id}deck_id:{deck_id}")
+        invalidate_user(g.user.id)
         return jsonify({"status": 1, "message": "Deck deleted successfully"})
 
 
@@ -188,26 +436,44 @@ def delete_deck(deck_id):
 def bulk_delete_decks():
     """Bulk delete decks"""
     if request.method == "POST":
-        data = json.loads(request.form.get("data", []))
-        for deck_id in data:
-            deck = Deck.get_by_user_or_404(deck_id, g.user.id)
-            deck.delete()
-            redis_cache.delete(f"user:{g.user.id}all_decks_dt")
-            redis_cache.delete(f"user:{g.user.id}deck_id:{deck_id}")
-        return jsonify({"status": 1, "message": "Decks deleted succesfully"})
+        data = json.loads(request.form.get("data", "[]"))
+        deck_ids = {int(deck_id) for deck_id in data if str(deck_id).isdigit()}
+        deleted, deleted_ids = Deck.bulk_delete(deck_ids, g.user.id)
+        invalidate_user(g.user.id)
+        return jsonify(
+            {
+                "status": 1,
+                "message": "Decks deleted succesfully",
+                "deleted": deleted,
+                "rejected": len(set(map(str, data))) - deleted,
+            }
+        )
 
 
 @core.route("/decks", methods=("GET", "POST"))
 @login_required
+@etag
 def decks():
-    all_decks = Deck.query.filter_by(user_id=g.user.id)
+    all_decks = Deck.summaries(g.user.id)
     if request.method == "GET":
         return render_template("dashboard/decks/_decks.html", decks=all_decks)
     elif request.method == "POST":
-        res = []
-        for deck in all_decks:
-            res.append(deck.to_json)
-        return jsonify(res)
+        return jsonify(all_decks)
+
+
+@core.route("/decks/json")
+@login_required
+@etag
+def decks_json():
+    """The user's deck summaries as a GET, see get_deck_json"""
+    return jsonify(Deck.summaries(g.user.id))
+
+
+@core.route("/decks/tree")
+@login_required
+def decks_tree():
+    """The user's decks as a tree, with card counts aggregated per subtree"""
+    return jsonify(Deck.tree(g.user.id))
 
 
 @core.route("/deck/<int:deck_id>/reset", methods=("GET", "POST"))
@@ -216,17 +482,19 @@ def reset_deck(deck_id):
     state = request.form.get("state")
     if state not in ("active", "solved"):
         abort(400)
+    sessions = request.form.get("sessions", None)
+    if sessions not in (None, "reset", "close"):
+        abort(400)
+    recursive = to_bool(request.form.get("recursive", True))
     deck = Deck.get_by_user_or_404(deck_id, g.user.id)
-    deck_cards = Card.query.filter_by(deck_id=deck.id)
-    for card in deck_cards:
-        card.update(state=state)
-    redis_cache.delete(f"user:{g.user.id}all_decks_dt")
-    redis_cache.delete(f"user:{g.user.id}deck_id:{deck_id}")
+    deck_ids = deck.reset(state, sessions=sessions, recursive=recursive)
+    invalidate_decks(*deck_ids)
     return jsonify("OK")
 
 
 @core.route("/plans", methods=("GET", "POST"))
 @login_required
+@cache_response(methods=("POST",))
 def study_plans():
     if request.method == "GET":
         study_plans = StudyPlan.query.filter_by(user_id=g.user.id)
@@ -236,8 +504,18 @@ def study_plans():
         return jsonify(plans)
 
 
+@core.route("/plans/json")
+@login_required
+@cache_response()
+def study_plans_json():
+    """The user's study plans as a GET, see get_deck_json"""
+    plans = [plan.to_json for plan in StudyPlan.query.filter_by(user_id=g.user.id)]
+    return jsonify(plans)
+
+
 @core.route("/plan/<int:plan_id>")
 @login_required
+@cache_response()
 def get_study_plan(plan_id):
     study_plan = StudyPlan.get_by_user_or_404(plan_id, g.user.id)
     return jsonify(study_plan.to_json)
@@ -252,30 +530,36 @@ def create_study_plan():
         order = request.form.get("order", None)
         if order is None or not hasattr(OrderTypeEnum, order):
             abort(400)
+        study_type = request.form.get("study_type", StudyTypeEnum.one_off.value)
+        if not hasattr(StudyTypeEnum, study_type):
+            abort(400)
 
         study_plan = StudyPlan(
             name=request.form.get("name"),
             description=request.form.get("description", None),
             user_id=g.user.id,
             order=order,
+            study_type=study_type,
             see_solved=to_bool(request.form.get("see_solved", False)),
         )
         study_plan.save()
+        invalidate_user(g.user.id)
         return jsonify("Success")
 
 
 @core.route("/plan/<int:plan_id>/delete", methods=["POST", "GET"])
 @login_required
 def delete_plan(plan_id):
-    plan = StudyPlan.query.get_or_404(plan_id)
+    plan = StudyPlan.get_by_user_or_404(plan_id, g.user.id)
     plan.delete()
+    invalidate_user(g.user.id)
     return jsonify({"status": 1, "message": "Study Plan deleted successfully"})
 
 
 @core.route("/plan/<int:plan_id>/edit", methods=["POST", "GET"])
 @login_required
 def edit_plan(plan_id):
-    plan = StudyPlan.query.get_or_404(plan_id)
+    plan = StudyPlan.get_by_user_or_404(plan_id, g.user.id)
     if request.method == "GET":
         return jsonify(
             {
@@ -288,20 +572,35 @@ def edit_plan(plan_id):
         order = request.form.get("order", None)
         if order is None or not hasattr(OrderTypeEnum, order):
             abort(400)
-        plan.update(order=order)
+        study_type = request.form.get(
+            "study_type", StudyTypeEnum(plan.study_type).value
+        )
+        if not hasattr(StudyTypeEnum, study_type):
+            abort(400)
+        plan.update(order=order, study_type=study_type)
+        invalidate_user(g.user.id)
+        current_plan = StudyPlan.current(g.user.id)
+        if current_plan is not None and current_plan.id == plan.id:
+            # Re-order the cards left in sessions that are still in progress
+            studying = StudySession.query.filter_by(user_id=g.user.id, state="Studying")
+            for study_session in studying:
+                study_session.build_queue(**StudyPlan.queue_options(plan))
+            db.session.commit()
         return jsonify({"status": 1, "message": "Study Plan updated successfully"})
 
 
 @core.route("deck/<int:deck_id>/study")
 @login_required
 def study_deck(deck_id):
-    """Study a deck"""
+    """Study a deck, together with all of its sub decks if `subdecks` is true"""
     deck = Deck.get_by_user_or_404(deck_id, g.user.id)
+    include_subdecks = to_bool(request.args.get("subdecks", False))
     study_session = (
         db.session.query(StudySession)
         .filter(
             StudySession.deck_id == deck.id,
             StudySession.user_id == g.user.id,
+            StudySession.include_subdecks == include_subdecks,
             or_(StudySession.state == "Studying"),
         )
         .first()
@@ -312,27 +611,87 @@ def study_deck(deck_id):
             deck_id=deck.id,
             known=0,
             unknown=0,
+            include_subdecks=include_subdecks,
             state="Studying",
         )
-        study_session.save()
         deck.state = "Studying"
-        deck.save()
-        redis_cache.delete(f"user:{g.user.id}deck_id:{deck.id}")
-    study_plan = (
-        StudyPlan.query.filter_by(user_id=g.user.id, state="Active")
-        .order_by(StudyPlan.date_created.desc())
-        .first()
-    )
-    first_card = Card.get_next_card(study_session.id, deck_id)
+        study_session.save()
+        invalidate_decks(deck.id)
+    study_plan = StudyPlan.current(g.user.id)
+    # Builds the session's study queue on first use
+    cards = Card.get_next_cards(study_session.id, deck_id, limit=study_prefetch_limit())
+    first_card = cards[0] if cards else None
     session["active_study_session"] = study_session.to_json
-    session["active_deck"] = deck.to_json
+    session["active_deck"] = study_deck_json(deck, study_session)
     session["active_card"] = first_card.to_json if first_card else None
     return render_template(
         "dashboard/decks/_study.html",
-        deck=deck.to_json,
+        deck=session["active_deck"],
         study_session=study_session,
         study_plan=study_plan,
         first_card=first_card,
+        card_buffer=[card.to_json for card in cards[1:]],
+    )
+
+
+def study_deck_json(deck, study_session):
+    """
+    The studied deck's JSON. Its card_count covers the sub decks' cards too
+    when they are studied with it
+    """
+    data = deck.to_json
+    if study_session.include_subdecks:
+        data["card_count"] = Deck.subtree_card_count(deck.id)
+    return data
+
+
+def study_prefetch_limit():
+    """
+    Number of cards to return in study responses: the active card and up to
+    `prefetch` upcoming cards, defaulting to the STUDY_PREFETCH config
+    """
+    prefetch = request.values.get(
+        "prefetch", current_app.config["STUDY_PREFETCH"], type=int
+    )
+    return 1 + max(0, min(prefetch, current_app.config["STUDY_PREFETCH_MAX"]))
+
+
+def study_session_progress(deck, study_session, next_cards):
+    """
+    JSON response of a study session after answers were recorded.
+    Completes the session when there are no cards left to study.
+    """
+    session["active_deck"] = study_deck_json(deck, study_session)
+    session["active_study_session"] = study_session.to_json
+    status, data = 0, {
+        "active_deck": session["active_deck"],
+        "active_study_session": session["active_study_session"],
+        "active_card": None,
+        "cards": [card.to_json for card in next_cards],
+    }
+    markup = None
+    if next_cards:
+        data["active_card"] = data["cards"][0]
+        status = 1
+        message = "Study Session Studying"
+        session["active_card"] = data["active_card"]
+        session["previous_study_session"] = None
+    else:
+        deck.update(state="Complete")
+        study_session.update(state="Complete")
+        session["active_card"] = None
+        message = "Study Session Complete"
+        markup = render_template(
+            "dashboard/decks/partials/session_stats.html",
+            previous_study_session=study_session,
+        )
+    if study_session.include_subdecks:
+        # Answers changed cards of the sub decks too
+        invalidate_decks(*Deck.subtree_ids([deck.id]))
+    else:
+        invalidate_decks(deck.id)
+    return jsonify(
+        {"status": status, "message": message, "data": data, "markup": markup}
     )
 
 
@@ -348,43 +707,51 @@ def get_next_study_card(deck_id, study_session_id):
         card_id = request.form.get("card_id", None)
         if card_state not in ("Known", "Unknown") or not card_id:
             abort(400)
-        # Create a study session log and update the study_session
-        log = StudySessionLog(
-            study_session_id=study_session_id, card_id=card_id, state=card_state
+        study_session.record_answers([(card_id, card_state, None)])
+        next_cards = Card.get_next_cards(
+            study_session_id, deck_id, limit=study_prefetch_limit()
         )
-        log.save()
-        if card_state == "Known":
-            study_session.update(known=StudySession.known + 1)
-        else:
-            study_session.update(unknown=StudySession.unknown + 1)
-        session["active_deck"] = deck.to_json
-        session["active_study_session"] = study_session.to_json
-        next_card = Card.get_next_card(study_session_id, deck_id)
-        status, data = 0, {
-            "active_deck": deck.to_json,
-            "active_study_session": study_session.to_json,
-            "active_card": None,
-        }
-        markup = None
-        if next_card is not None:
-            data["active_card"] = next_card.to_json
-            status = 1
-            message = "Study Session Studying"
-            session["active_card"] = next_card.to_json
-            session["previous_study_session"] = None
-        else:
-            deck.update(state="Complete")
-            StudySession.query.get(study_session.id).update(state="Complete")
-            session["active_card"] = None
-            message = "Study Session Complete"
-            markup = render_template(
-                "dashboard/decks/partials/session_stats.html",
-                previous_study_session=study_session,
+        return study_session_progress(deck, study_session, next_cards)
+
+
+@core.route(
+    "deck/<int:deck_id>/study/<int:study_session_id>/answers", methods=["POST"]
+)
+@login_required
+def submit_study_answers(deck_id, study_session_id):
+    """
+    Record a batch of answers for a study session and return the next batch
+    of cards. Expects a JSON list of {card_id, state, answered_at} objects,
+    either as the request body or in the `data` form field.
+    """
+    study_session = StudySession.get_by_user_or_404(study_session_id, g.user.id)
+    if study_session.state != "Studying" or study_session.deck_id != deck_id:
+        abort(400)
+    deck = Deck.get_by_user_or_404(deck_id, g.user.id)
+    batch_size = request.args.get("batch_size", 10, type=int)
+    answers = []
+    try:
+        data = request.get_json(silent=True)
+        if data is None:
+            data = json.loads(request.form.get("data", "[]"))
+        for answer in data:
+            if answer["state"] not in ("Known", "Unknown"):
+                abort(400)
+            answered_at = answer.get("answered_at")
+            answers.append(
+                (
+                    int(answer["card_id"]),
+                    answer["state"],
+                    parse_datetime(answered_at) if answered_at else None,
+                )
             )
-        redis_cache.delete(f"user:{g.user.id}deck_id:{deck_id}")
-        return jsonify(
-            {"status": status, "message": message, "data": data, "markup": markup}
-        )
+    except (KeyError, TypeError, ValueError):
+        abort(400)
+    study_session.record_answers(answers)
+    next_cards = Card.get_next_cards(
+        study_session_id, deck_id, limit=max(1, min(batch_size, 100))
+    )
+    return study_session_progress(deck, study_session, next_cards)
 
 
 @core.route("deck/<int:deck_id>/add-cards", methods=("GET",))
@@ -394,3 +761,11 @@ def add_cards(deck_id):
     if request.method == "GET":
         deck = Deck.query.get_or_404(deck_id)
         return render_template("dashboard/decks/_add_cards.html", deck=deck)
+
+
+@core.route("/cache/stats")
+@login_required
+@super_user_required
+def cache_stats():
+    """Hit and miss counters of each cache tier, for the worker serving it"""
+    return jsonify(dict(pid=os.getpid(), **redis_cache.stats()))
@@ -1,15 +1,9 @@
 from flask import redirect, url_for, g, request, abort
 from instance.config import BaseConfig
 from functools import wraps
+from flashlearn.cache_backends import from_config
 
-if BaseConfig.USE_REDIS_CACHE:
-    from flask_caching.backends import RedisCache
-
-    redis_cache = RedisCache(port=6379, host="redis", default_timeout=300)
-else:
-    from flask_caching.backends import SimpleCache
-
-    redis_cache = SimpleCache(default_timeout=1)
+redis_cache = from_config(BaseConfig)
 
 
 def login_required(view):
@@ -33,23 +27,3 @@ def super_user_required(view):
         return view(*args, **kwargs)
 
     return wrapped_view
-
-
-def cache(view):
-    @wraps(view)
-    def wrapper(*args, **kwargs):
-        cached_key = ""
-        if args:
-            cached_key = f"user:{g.user.id}{args[0]}"
-        else:
-            for k, v in kwargs.items():
-                cached_key = f"user:{g.user.id}{k}:{v}"
-                break
-        cached_view = redis_cache.get(str(cached_key))
-        if cached_view:
-            return cached_view
-        _ = view(*args, **kwargs)
-        redis_cache.set(str(cached_key), str(_))
-        return _
-
-    return wrapper
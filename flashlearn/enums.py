@@ -10,3 +10,4 @@ class OrderTypeEnum(enum.Enum):
 class StudyTypeEnum(enum.Enum):
     one_off = "one_off"
     recurrent = "recurrent"
+    spaced_repetition = "spaced_repetition"
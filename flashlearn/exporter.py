@@ -0,0 +1,120 @@
+"""
+Streaming card exports.
+Cards are read from a server-side cursor in batches of EXPORT_BATCH_SIZE and
+serialized as they arrive, so memory use stays constant no matter how many
+cards are exported.
+"""
+import csv
+import io
+import json
+import zlib
+from flashlearn.models import Card, Deck
+
+EXPORT_BATCH_SIZE = 1000
+# Serialized rows are sent in chunks of about this many bytes
+WRITE_SIZE = 64 * 1024
+EXPORT_FIELDS = (
+    "id",
+    "deck",
+    "front",
+    "back",
+    "state",
+    "date_created",
+    "next_review_at",
+)
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_query(user_id, deck_ids=None):
+    """
+    Plain column rows for a user's cards, optionally limited to some decks.
+    Rows are fetched EXPORT_BATCH_SIZE at a time, over a server-side cursor
+    on Postgres
+    :type deck_ids: iterable | None
+    """
+    query = (
+        Card.query.join(Deck, Deck.id == Card.deck_id)
+        .filter(Card.user_id == user_id)
+        .with_entities(
+            Card.id,
+            Deck.name.label("deck"),
+            Card.front,
+            Card.back,
+            Card.state,
+            Card.date_created,
+            Card.next_review_at,
+        )
+        .order_by(Card.id)
+    )
+    if deck_ids is not None:
+        query = query.filter(Card.deck_id.in_(list(deck_ids)))
+    return query.yield_per(EXPORT_BATCH_SIZE)
+
+
+def serialize_row(row):
+    return {
+        field: value.isoformat() if hasattr(value, "isoformat") else value
+        for field, value in zip(EXPORT_FIELDS, row)
+    }
+
+
+def iter_ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(serialize_row(row)) + "\n"
+
+
+def iter_csv_lines(rows):
+    """CSV lines, with a header row the CSV importer can map columns from"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(serialize_row(row))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_chunks(lines, write_size=WRITE_SIZE):
+    """Join lines into utf-8 chunks of about `write_size` bytes"""
+    chunk, size = [], 0
+    for line in lines:
+        data = line.encode("utf-8")
+        chunk.append(data)
+        size += len(data)
+        if size >= write_size:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+def iter_gzip(chunks):
+    """Gzip compress a stream of byte chunks on the fly"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_cards(user_id, fmt="ndjson", deck_ids=None, compress=False):
+    """
+    Stream a user's cards as NDJSON or CSV
+    :param fmt: One of EXPORT_FORMATS
+    :type fmt: str
+    :param deck_ids: Decks to export, all of the user's cards when None
+    :type deck_ids: iterable | None
+    :param compress: Gzip the output
+    :type compress: bool
+    :return: A generator of byte chunks
+    """
+    rows = export_query(user_id, deck_ids)
+    lines = iter_csv_lines(rows) if fmt == "csv" else iter_ndjson_lines(rows)
+    chunks = iter_chunks(lines)
+    return iter_gzip(chunks) if compress else chunks
@@ -0,0 +1,263 @@
+"""
+Incremental, chunked card imports.
+Request bodies are parsed one card at a time and inserted in fixed size
+chunks, so memory use stays bounded no matter how large the import is.
+"""
+import codecs
+import csv
+import json
+import logging
+import os
+from collections import Counter
+from flashlearn import db
+from flashlearn.cache import invalidate_user
+from flashlearn.models import Card, Deck, DeckStats
+
+logger = logging.getLogger("flashlearn")
+
+IMPORT_CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024
+# Keep SQLite multi-row INSERTs under its 999 bound parameters limit
+SQLITE_ROWS_PER_INSERT = 100
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_ndjson(stream):
+    """
+    Parse newline delimited JSON from a binary stream, one line at a time
+    :param stream: e.g request.stream
+    """
+    for line in iter(stream.readline, b""):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """
+    Parse the items of a JSON array from a binary stream without loading the
+    whole document in memory. Accepts the same documents as json.loads()
+    :param stream: e.g request.stream
+    :raises ValueError: When the document is not a valid JSON array
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer, eof = "", False
+    # What comes next: "[", "item" or "]" after it, "," or "]" after an
+    # item, an "item" after a comma, then nothing but whitespace
+    expected = "["
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and expected == "[":
+            if buffer[0] != "[":
+                raise ValueError("Expected a JSON array")
+            buffer, expected = buffer[1:], "item or ]"
+            continue
+        if buffer and expected == "end":
+            raise ValueError("Extra data after the JSON array")
+        if buffer and buffer[0] == "]" and expected != "item":
+            buffer, expected = buffer[1:], "end"
+            continue
+        if buffer and expected == ", or ]":
+            if buffer[0] != ",":
+                raise ValueError("Expected , or ] after an array item")
+            buffer, expected = buffer[1:], "item"
+            continue
+        if buffer and buffer[0] in ",]":
+            raise ValueError("Expected an array item")
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                end = None
+            # A value ending the buffer may be cut short, e.g a number
+            if end is not None and (end < len(buffer) or eof):
+                buffer, expected = buffer[end:], ", or ]"
+                yield item
+                continue
+        if eof:
+            if expected == "end":
+                return
+            raise ValueError("Unexpected end of JSON array")
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer += text.decode(chunk, final=eof)
+
+
+def validate_card(item):
+    """
+    Check an imported card
+    :return: An error message, or None if the card is valid
+    """
+    if not isinstance(item, dict):
+        return "Expected an object with front and back fields"
+    for field in ("front", "back"):
+        value = item.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f"{field} is required"
+    return None
+
+
+def insert_cards(rows):
+    """Insert a chunk of cards and update their decks' stats, in one commit"""
+    if db.engine.dialect.name == "sqlite":
+        for start in range(0, len(rows), SQLITE_ROWS_PER_INSERT):
+            end = start + SQLITE_ROWS_PER_INSERT
+            db.session.execute(Card.__table__.insert().values(rows[start:end]))
+    else:
+        # executemany(), batched into multi-row INSERTs on Postgres
+        # by the executemany_mode engine option set in create_app
+        db.session.execute(Card.__table__.insert(), rows)
+    for deck_id, count in Counter(row["deck_id"] for row in rows).items():
+        DeckStats.apply_card_delta(deck_id, "Active", count)
+    db.session.commit()
+
+
+def import_cards(
+    items,
+    deck_id,
+    user_id,
+    chunk_size=IMPORT_CHUNK_SIZE,
+    resolve_deck=None,
+    strict=False,
+):
+    """
+    Validate and insert cards in chunks of `chunk_size`, committing each chunk.
+    Invalid cards are skipped and reported, a malformed document stops the
+    import after the cards parsed so far.
+    Yields the progress after every chunk; the last one has `done` set and
+    lists up to MAX_REPORTED_ERRORS errors.
+    :param items: Cards to import, e.g from iter_json_array
+    :type items: iterable
+    :param resolve_deck: Optional callable returning the id of the deck an
+        item goes to, instead of deck_id
+    :type resolve_deck: callable | None
+    :param strict: Raise the ValueError of a malformed document instead,
+        as long as no chunk was committed
+    :type strict: bool
+    """
+    progress = {"imported": 0, "failed": 0, "done": False, "errors": []}
+    rows, index = [], -1
+
+    def report(row, error):
+        progress["failed"] += 1
+        if len(progress["errors"]) < MAX_REPORTED_ERRORS:
+            progress["errors"].append({"row": row, "error": error})
+
+    try:
+        for index, item in enumerate(items):
+            error = validate_card(item)
+            if error:
+                report(index, error)
+                continue
+            rows.append(
+                dict(
+                    front=item["front"],
+                    back=item["back"],
+                    deck_id=resolve_deck(item) if resolve_deck else deck_id,
+                    user_id=user_id,
+                )
+            )
+            if len(rows) >= chunk_size:
+                insert_cards(rows)
+                progress["imported"] += len(rows)
+                rows = []
+                yield dict(progress, errors=[])
+    except ValueError as e:
+        # json.JSONDecodeError is a ValueError too
+        if strict and not progress["imported"]:
+            raise
+        report(index + 1, str(e))
+    if rows:
+        insert_cards(rows)
+        progress["imported"] += len(rows)
+    progress["done"] = True
+    yield progress
+
+
+def column_index(column, header):
+    """Resolve a column given by header name or 0-based index"""
+    if column in header:
+        return header.index(column)
+    if column.isdigit():
+        return int(column)
+    raise ValueError(f"Unknown column {column}")
+
+
+def iter_csv_cards(path, delimiter, front_column, back_column, deck_column, header):
+    """
+    Parse cards from a CSV/TSV file, one row at a time
+    :param deck_column: Optional column holding a sub deck name
+    :param header: Whether the file's first row is a header
+    :type header: bool
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        names = next(reader, []) if header else []
+        columns = {"front": front_column, "back": back_column, "deck": deck_column}
+        columns = {
+            field: column_index(column, names)
+            for field, column in columns.items()
+            if column
+        }
+        for row in reader:
+            yield {
+                field: row[index] if index < len(row) else None
+                for field, index in columns.items()
+            }
+
+
+def sub_deck_resolver(deck):
+    """
+    Map sub deck names to the ids of deck's children, creating the
+    missing ones under deck
+    """
+    deck_ids = {
+        child.name: child.id
+        for child in Deck.query.filter_by(parent_id=deck.id, user_id=deck.user_id)
+    }
+
+    def resolve(item):
+        name = (item.get("deck") or "").strip()[:100]
+        if not name:
+            return deck.id
+        if name not in deck_ids:
+            child = Deck(
+                name=name, user_id=deck.user_id, parent_id=deck.id, state="New"
+            )
+            child.save()
+            deck_ids[name] = child.id
+        return deck_ids[name]
+
+    return resolve
+
+
+def run_import_job(job):
+    """
+    Import the file of a claimed ImportJob, saving its progress after every
+    chunk so it can be followed with the job's status endpoint
+    :type job: flashlearn.models.ImportJob
+    """
+    try:
+        items = iter_csv_cards(
+            job.file_path,
+            job.delimiter,
+            job.front_column,
+            job.back_column,
+            job.deck_column,
+            job.has_header,
+        )
+        for progress in import_cards(
+            items, job.deck_id, job.user_id, resolve_deck=sub_deck_resolver(job.deck)
+        ):
+            job.update(imported=progress["imported"], failed=progress["failed"])
+        job.update(state="Complete", errors=json.dumps(progress["errors"]))
+        # Sub decks may have been created too
+        invalidate_user(job.user_id)
+    except Exception as e:
+        logger.exception("Import job %s failed", job.id)
+        db.session.rollback()
+        job.update(state="Failed", message=str(e))
+    finally:
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
@@ -1,15 +1,31 @@
+import hashlib
+import json
 import logging
+import random
 import re
+from datetime import datetime, timedelta, timezone
 from flask import abort, g
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import backref
-from sqlalchemy.sql import func
-from flask_bcrypt import Bcrypt
+from sqlalchemy.sql import and_, case, func, literal, select
 from werkzeug.http import http_date
-from flashlearn import db
-from flashlearn.enums import OrderTypeEnum
+from flashlearn import db, redis_cache
+from flashlearn.enums import OrderTypeEnum, StudyTypeEnum
+from flashlearn.passwords import check_password, hash_password, needs_rehash
+from flashlearn.scheduler import ANSWER_QUALITY, DEFAULT_EASE_FACTOR, sm2
+from flashlearn.utils import chunks, decode_cursor, encode_cursor
 
 logger = logging.getLogger("flashlearn")
 
+# Max ids per `IN (...)` clause, SQLite allows 999 bound parameters by default
+BULK_CHUNK_SIZE = 500
+# SQLite stores server default timestamps as "YYYY-MM-DD HH:MM:SS" strings,
+# compare them to bound values in the same format. Also the column type of
+# timestamps written both ways that keyset cursors compare
+TIMESTAMP_PARAM = db.DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+)
+
 
 class TimestampedModel(db.Model):
     """Base model class for all timestamped models"""
@@ -73,16 +89,29 @@ class User(TimestampedModel):
         """Initialize new user model"""
         self.username = username
         if password:
-            self.password = Bcrypt().generate_password_hash(password).decode()
+            self.password = hash_password(password)
         self.email = email
 
     def password_is_valid(self, password):
         """Checks a submitted password against its stored hash"""
-        return Bcrypt().check_password_hash(self.password, password)
+        return check_password(password, self.password)
 
     def set_password(self, password):
         """Set password"""
-        self.password = Bcrypt().generate_password_hash(password).decode()
+        self.password = hash_password(password)
+
+    def rehash_password(self, password):
+        """
+        Rehash a valid password if its hash used another cost factor than
+        the configured BCRYPT_LOG_ROUNDS, e.g on login after raising it
+        :return: Whether the password was rehashed
+        :rtype: bool
+        """
+        if not needs_rehash(self.password):
+            return False
+        self.set_password(password)
+        db.session.commit()
+        return True
 
     @property
     def to_json(self):
@@ -92,7 +121,7 @@ class User(TimestampedModel):
             email=self.email,
             date_created=http_date(self.date_created),
             date_modified=http_date(self.date_updated),
-            decks=[d.to_json for d in self.decks],
+            decks=Deck.summaries(self.id),
             study_plans=[p.to_json for p in self.study_plans],
             is_active=True if self.state == "active" else False,
         )
@@ -100,11 +129,24 @@ class User(TimestampedModel):
     def save(self):
         """
         Overrides default save method.
+        New users get a default deck and study plan.
         """
+        is_new = self.id is None
         db.session.add(self)
         db.session.commit()
-        Deck.create_default_deck(user_id=self.id)
-        StudyPlan.create_default_study_plan(user_id=self.id)
+        UserSnapshot.invalidate(self.id)
+        if is_new:
+            Deck.create_default_deck(user_id=self.id)
+            StudyPlan.create_default_study_plan(user_id=self.id)
+
+    def update(self, **kwargs):
+        super(User, self).update(**kwargs)
+        UserSnapshot.invalidate(self.id)
+
+    def delete(self):
+        user_id = self.id
+        super(User, self).delete()
+        UserSnapshot.invalidate(user_id)
 
     @classmethod
     def check_username(cls, username, user_id=None):
@@ -136,6 +178,79 @@ class User(TimestampedModel):
         return f"<User: {self.username} - {self.state}>"
 
 
+class UserSnapshot:
+    """
+    The authenticated user, as stored in g.user.
+    Requests are authenticated from a small cached snapshot of the user's
+    columns, so most requests don't query the users table at all. Reading
+    any other attribute, e.g email or to_json, loads the full User once and
+    attribute writes go to that User.
+    """
+
+    # Bump when the snapshot's fields change, so stale entries are not read
+    version = 1
+    fields = ("id", "username", "is_superuser", "onboarded")
+
+    def __init__(self, data):
+        self.__dict__["_data"] = data
+        self.__dict__["_user"] = None
+
+    @classmethod
+    def cache_key(cls, user_id):
+        return f"user:{user_id}:snapshot:v{cls.version}"
+
+    @classmethod
+    def load(cls, user_id, timeout=None):
+        """
+        The snapshot of a user, from the cache or a single row query
+        :param timeout: Cache timeout in seconds, the cache's default if None
+        :return: The snapshot, None if the user does not exist
+        """
+        data = redis_cache.get(cls.cache_key(user_id))
+        if data is None:
+            columns = [getattr(User, field) for field in cls.fields]
+            row = db.session.query(*columns).filter(User.id == user_id).first()
+            if row is None:
+                return None
+            data = dict(zip(cls.fields, row))
+            redis_cache.set(cls.cache_key(user_id), data, timeout=timeout)
+        return cls(data)
+
+    @classmethod
+    def invalidate(cls, user_id):
+        redis_cache.delete(cls.cache_key(user_id))
+
+    @property
+    def instance(self):
+        """The full User, loaded on first use"""
+        if self._user is None:
+            self.__dict__["_user"] = User.query.get_or_404(self._data["id"])
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._data:
+            return self._data[name]
+        return getattr(self.instance, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.instance, name, value)
+        if name in self._data:
+            self._data[name] = value
+
+    def __eq__(self, other):
+        if isinstance(other, (User, UserSnapshot)):
+            return self.id == other.id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<UserSnapshot: {self.username}>"
+
+
 class Deck(TimestampedModel):
     """Deck model class"""
 
@@ -160,13 +275,55 @@ class Deck(TimestampedModel):
         super(Deck, self).__init__(**kwargs)
 
     def save(self):
+        # Checked before querying the parent, which may autoflush this deck
+        is_new = self.id is None
         if self.parent_id and Deck.query.filter_by(id=self.parent_id).first() is None:
             raise ValueError("Parent does not exist")
         db.session.add(self)
+        if is_new:
+            db.session.flush()
+            db.session.add(DeckStats(deck_id=self.id))
+            DeckStats.apply_child_delta(self.parent_id, 1)
         db.session.commit()
 
+    def update(self, **kwargs):
+        old_parent_id = self.parent_id
+        if "parent_id" in kwargs:
+            parent_id = kwargs["parent_id"]
+            kwargs["parent_id"] = int(parent_id) if parent_id else None
+            if kwargs["parent_id"] != old_parent_id:
+                self.check_parent(kwargs["parent_id"])
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        if str(old_parent_id or "") != str(self.parent_id or ""):
+            DeckStats.apply_child_delta(old_parent_id, -1)
+            DeckStats.apply_child_delta(self.parent_id, 1)
+        db.session.commit()
+
+    def check_parent(self, parent_id):
+        """
+        Raise a ValueError unless parent_id is a deck of the same user that
+        is outside of this deck's subtree, so moving the deck there can not
+        create a cycle. The subtree is checked by a single recursive query.
+        :type parent_id: int | None
+        """
+        if parent_id is None:
+            return
+        if Deck.query.filter_by(id=parent_id, user_id=self.user_id).first() is None:
+            raise ValueError("Parent does not exist")
+        subtree = Deck.subtree_cte([self.id])
+        if db.session.query(subtree.c.id).filter(subtree.c.id == parent_id).first():
+            raise ValueError("A deck can not be moved into itself or its sub decks")
+
     @property
     def to_json(self):
+        summary = Deck.summary_query(self.user_id).filter(Deck.id == self.id).first()
+        if summary is None:
+            return self.summary_to_json(0, 0, None, None, None)
+        return self.summary_to_json(*summary[1:])
+
+    def summary_to_json(self, child_count, card_count, known, unknown, last_studied):
+        """Serialize a deck from the aggregated columns of Deck.summary_query"""
         return dict(
             id=self.id,
             name=self.name,
@@ -174,50 +331,89 @@ class Deck(TimestampedModel):
             description=self.description,
             user=self.user_id,
             parent=self.parent_id,
-            child_count=self.child_count,
-            card_count=self.card_count,
-            stats=self.quick_stats,
+            child_count=child_count,
+            card_count=card_count,
+            stats=self.build_stats(card_count, known, unknown, last_studied),
             date_created=self.date_created,
             date_updated=self.date_updated,
         )
 
     @property
     def children_to_json(self):
-        return dict([child.to_json for child in self.children])
+        return [child.to_json for child in self.children]
 
     @property
     def child_count(self):
-        return len(self.children)
+        return self.stats.child_count if self.stats else 0
 
     @property
     def card_count(self):
-        return len(self.cards)
+        return self.stats.card_count if self.stats else 0
 
     @property
     def quick_stats(self):
+        if self.stats is None:
+            return self.build_stats(0, None, None, None)
+        return self.build_stats(
+            self.stats.card_count,
+            self.stats.known,
+            self.stats.unknown,
+            self.stats.last_studied,
+        )
+
+    def build_stats(self, card_count, known, unknown, last_studied):
+        """
+        Build the deck's quick stats from its card count and the
+        known/unknown counters of its latest study session
+        """
         stats = {
             "progress": 0,
             "known": 0,
             "unknown": 0,
-            "remaining": self.card_count,
+            "remaining": card_count,
             "last_studied": "",
         }
-        if self.state != "New":
-            study_session = (
-                StudySession.query.filter_by(deck_id=self.id, user_id=g.user.id)
-                .order_by(StudySession.date_updated.desc())
-                .first()
-            )
-            if study_session:
-                known, unknown = study_session.known, study_session.unknown
-                stats["known"] = known
-                stats["unknown"] = unknown
-                stats["remaining"] = self.card_count - (known + unknown)
-                stats["last_studied"] = study_session.date_updated
-                if all([known + unknown > 0, self.card_count > 0]):
-                    stats["progress"] = int(((known + unknown) / self.card_count) * 100)
+        if self.state != "New" and last_studied is not None:
+            known, unknown = known or 0, unknown or 0
+            stats["known"] = known
+            stats["unknown"] = unknown
+            stats["remaining"] = card_count - (known + unknown)
+            stats["last_studied"] = last_studied
+            if all([known + unknown > 0, card_count > 0]):
+                stats["progress"] = int(((known + unknown) / card_count) * 100)
         return stats
 
+    @classmethod
+    def summary_query(cls, user_id):
+        """
+        Query a user's decks together with their child count, card count and
+        the known/unknown counters of the latest study session.
+        The counters are read from the deck_stats table, so listing decks is a
+        primary key join rather than a COUNT over cards and study sessions.
+        Rows are (deck, child_count, card_count, known, unknown, last_studied)
+        """
+        return (
+            db.session.query(
+                cls,
+                func.coalesce(DeckStats.child_count, 0),
+                func.coalesce(DeckStats.card_count, 0),
+                DeckStats.known,
+                DeckStats.unknown,
+                DeckStats.last_studied,
+            )
+            .outerjoin(DeckStats, DeckStats.deck_id == cls.id)
+            .filter(cls.user_id == user_id)
+            .order_by(cls.id)
+        )
+
+    @classmethod
+    def summaries(cls, user_id):
+        """Serialized summaries of all the decks owned by a user"""
+        return [
+            deck.summary_to_json(*columns)
+            for deck, *columns in cls.summary_query(user_id)
+        ]
+
     @classmethod
     def create_default_deck(cls, user_id):
         user = User.query.get_or_404(user_id)
@@ -233,10 +429,225 @@ class Deck(TimestampedModel):
         if user and len(user.decks) < 2:
             create_default = True
         db.session.delete(self.query.filter_by(id=self.id).first())
+        DeckStats.apply_child_delta(self.parent_id, -1)
         db.session.commit()
         if create_default:
             self.create_default_deck(user_id=user.id)
 
+    @classmethod
+    def subtree_cte(cls, deck_ids):
+        """
+        Recursive CTE of the ids of the given decks and of all their sub
+        decks. UNION rather than UNION ALL, so it terminates even if the
+        data holds a cycle.
+        :type deck_ids: iterable
+        """
+        subtree = (
+            db.session.query(cls.id.label("id"))
+            .filter(cls.id.in_(list(deck_ids)))
+            .cte("subtree", recursive=True)
+        )
+        return subtree.union(
+            db.session.query(cls.id).filter(cls.parent_id == subtree.c.id)
+        )
+
+    @classmethod
+    def subtree_ids(cls, deck_ids):
+        """Ids of the given decks and of all their sub decks"""
+        subtree = set()
+        for chunk in chunks(list(deck_ids), BULK_CHUNK_SIZE):
+            cte = cls.subtree_cte(chunk)
+            subtree.update(deck_id for deck_id, in db.session.query(cte.c.id))
+        return subtree
+
+    @classmethod
+    def subtree_card_count(cls, deck_id):
+        """Number of cards in a deck and all of its sub decks"""
+        subtree = cls.subtree_cte([deck_id])
+        return (
+            db.session.query(func.coalesce(func.sum(DeckStats.card_count), 0))
+            .join(subtree, subtree.c.id == DeckStats.deck_id)
+            .scalar()
+        )
+
+    @classmethod
+    def tree(cls, user_id):
+        """
+        A user's decks as a tree of serialized summaries, each with a
+        `children` list and its card and deck counts aggregated over its
+        whole subtree, e.g subtree_card_count. Loaded in a single query: a
+        recursive CTE pairs every deck with each of its descendants and the
+        deck_stats counters are summed per ancestor.
+        :rtype: list
+        """
+        closure = (
+            db.session.query(cls.id.label("ancestor_id"), cls.id.label("deck_id"))
+            .filter(cls.user_id == user_id)
+            .cte("closure", recursive=True)
+        )
+        closure = closure.union(
+            db.session.query(closure.c.ancestor_id, cls.id).filter(
+                cls.parent_id == closure.c.deck_id
+            )
+        )
+        totals = (
+            db.session.query(
+                closure.c.ancestor_id,
+                func.coalesce(func.sum(DeckStats.card_count), 0).label("card_count"),
+                func.count(closure.c.deck_id).label("deck_count"),
+            )
+            .outerjoin(DeckStats, DeckStats.deck_id == closure.c.deck_id)
+            .group_by(closure.c.ancestor_id)
+            .subquery()
+        )
+        rows = cls.summary_query(user_id).add_columns(
+            totals.c.card_count, totals.c.deck_count
+        )
+        rows = rows.outerjoin(totals, totals.c.ancestor_id == cls.id)
+
+        nodes, parents = {}, {}
+        for deck, *columns, subtree_card_count, subtree_deck_count in rows:
+            node = deck.summary_to_json(*columns)
+            node["subtree_card_count"] = subtree_card_count or 0
+            node["subtree_deck_count"] = subtree_deck_count or 1
+            node["children"] = []
+            nodes[deck.id] = node
+            parents[deck.id] = deck.parent_id
+        roots = []
+        for deck_id, node in nodes.items():
+            parent = nodes.get(parents[deck_id])
+            (parent["children"] if parent else roots).append(node)
+        return roots
+
+    def reset(self, state, sessions=None, recursive=True):
+        """
+        Set the state of every card in the deck with bulk UPDATEs, in a single
+        transaction.
+        :param state: The new card state, in any case
+        :type state: str
+        :param sessions: What to do with the deck's in progress study
+            sessions: "reset" clears their progress, "close" completes them
+            and None leaves them alone
+        :type sessions: str | None
+        :param recursive: Also reset the deck's sub decks
+        :type recursive: bool
+        :return: The ids of the reset decks
+        :rtype: set
+        """
+        # Stored like the states cards are created, studied and filtered with
+        state = state.capitalize()
+        deck_ids = Deck.subtree_ids([self.id]) if recursive else {self.id}
+        for chunk in chunks(list(deck_ids), BULK_CHUNK_SIZE):
+            Card.query.filter(Card.deck_id.in_(chunk)).update(
+                {Card.state: state}, synchronize_session=False
+            )
+            DeckStats.reset_states(chunk, state)
+            studying = StudySession.query.filter(
+                StudySession.deck_id.in_(chunk), StudySession.state == "Studying"
+            )
+            session_ids = studying.with_entities(StudySession.id).subquery()
+            if sessions == "reset":
+                for model in (StudyQueueItem, StudySessionLog):
+                    model.query.filter(model.study_session_id.in_(session_ids)).delete(
+                        synchronize_session=False
+                    )
+                DeckStats.query.filter(
+                    DeckStats.last_session_id.in_(session_ids)
+                ).update(
+                    {DeckStats.known: 0, DeckStats.unknown: 0},
+                    synchronize_session=False,
+                )
+                studying.update(
+                    {StudySession.known: 0, StudySession.unknown: 0},
+                    synchronize_session=False,
+                )
+            elif sessions == "close":
+                studying.update(
+                    {StudySession.state: "Complete"}, synchronize_session=False
+                )
+        db.session.commit()
+        # Expire cards, sessions and stats loaded before the bulk updates
+        db.session.expire_all()
+        return deck_ids
+
+    @classmethod
+    def deepest_first(cls, deck_ids):
+        """
+        Order deck ids by their depth among deck_ids, sub decks before their
+        parents
+        :type deck_ids: set
+        :rtype: list
+        """
+        parents = {}
+        for chunk in chunks(list(deck_ids), BULK_CHUNK_SIZE):
+            parents.update(
+                db.session.query(cls.id, cls.parent_id).filter(cls.id.in_(chunk))
+            )
+
+        def depth(deck_id):
+            seen = {deck_id}
+            while parents.get(deck_id) in parents and parents[deck_id] not in seen:
+                deck_id = parents[deck_id]
+                seen.add(deck_id)
+            return len(seen)
+
+        return sorted(parents, key=depth, reverse=True)
+
+    @classmethod
+    def bulk_delete(cls, deck_ids, user_id):
+        """
+        Delete a user's decks, their sub decks and everything in them with
+        set based, chunked statements in a single transaction.
+        Ids of missing decks or decks owned by other users are ignored.
+        :return: The number of deleted decks out of deck_ids and the ids of
+            every deleted deck, sub decks included
+        :rtype: tuple
+        """
+        owned = []
+        for chunk in chunks(list(deck_ids), BULK_CHUNK_SIZE):
+            owned += db.session.query(cls.id, cls.parent_id).filter(
+                cls.id.in_(chunk), cls.user_id == user_id
+            )
+        deleted = cls.subtree_ids([deck_id for deck_id, _ in owned])
+
+        # Deepest decks first, so no chunk deletes a deck before its sub decks
+        for chunk in chunks(cls.deepest_first(deleted), BULK_CHUNK_SIZE):
+            sessions = db.session.query(StudySession.id).filter(
+                StudySession.deck_id.in_(chunk)
+            )
+            cards = db.session.query(Card.id).filter(Card.deck_id.in_(chunk))
+            for model, column in (
+                (StudyQueueItem, StudyQueueItem.study_session_id),
+                (StudySessionLog, StudySessionLog.study_session_id),
+            ):
+                model.query.filter(column.in_(sessions.subquery())).delete(
+                    synchronize_session=False
+                )
+            for model in (StudyQueueItem, StudySessionLog):
+                model.query.filter(model.card_id.in_(cards.subquery())).delete(
+                    synchronize_session=False
+                )
+            StudySession.query.filter(StudySession.deck_id.in_(chunk)).delete(
+                synchronize_session=False
+            )
+            Card.query.filter(Card.deck_id.in_(chunk)).delete(
+                synchronize_session=False
+            )
+            for model in (DeckStats, ImportJob):
+                model.query.filter(model.deck_id.in_(chunk)).delete(
+                    synchronize_session=False
+                )
+            cls.query.filter(cls.id.in_(chunk)).delete(synchronize_session=False)
+        for deck_id, parent_id in owned:
+            if parent_id not in deleted:
+                DeckStats.apply_child_delta(parent_id, -1)
+        db.session.commit()
+        # Expire loaded decks, cards and sessions that were deleted above
+        db.session.expire_all()
+        if deleted and cls.query.filter_by(user_id=user_id).first() is None:
+            cls.create_default_deck(user_id=user_id)
+        return len(owned), deleted
+
     def __repr__(self):
         return f"<Deck: {self.name}>"
 
@@ -250,14 +661,97 @@ class Card(TimestampedModel):
     back = db.Column(db.Text(), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     deck_id = db.Column(db.Integer, db.ForeignKey("decks.id"), nullable=False)
+    # Spaced repetition schedule, new cards are due as soon as they are created
+    repetitions = db.Column(db.Integer, default=0)
+    interval_days = db.Column(db.Integer, default=0)
+    ease_factor = db.Column(db.Float, default=DEFAULT_EASE_FACTOR)
+    next_review_at = db.Column(TIMESTAMP_PARAM, server_default=func.now())
 
     user = db.relationship(User, backref=backref("cards", cascade="all,delete"))
     deck = db.relationship(Deck, backref=backref("cards", cascade="all,delete"))
 
+    __table_args__ = (
+        db.Index(
+            "ix_cards_user_id_deck_id_state_date_created",
+            "user_id",
+            "deck_id",
+            "state",
+            "date_created",
+        ),
+        db.Index(
+            "ix_cards_user_id_state_next_review_at",
+            "user_id",
+            "state",
+            "next_review_at",
+        ),
+        db.Index(
+            "ix_cards_deck_id_state_next_review_at",
+            "deck_id",
+            "state",
+            "next_review_at",
+        ),
+        db.Index("ix_cards_user_id_date_created_id", "user_id", "date_created", "id"),
+        db.Index("ix_cards_deck_id_date_created_id", "deck_id", "date_created", "id"),
+    )
+
     def __init__(self, **kwargs):
         """Initialize a card"""
         super(Card, self).__init__(**kwargs)
 
+    def save(self):
+        is_new = self.id is None
+        db.session.add(self)
+        if is_new:
+            db.session.flush()
+            DeckStats.apply_card_delta(self.deck_id, self.state, 1)
+        db.session.commit()
+
+    def update(self, **kwargs):
+        old_deck_id, old_state = self.deck_id, self.state
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        if str(old_deck_id) != str(self.deck_id) or old_state != self.state:
+            DeckStats.apply_card_delta(old_deck_id, old_state, -1)
+            DeckStats.apply_card_delta(self.deck_id, self.state, 1)
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self.query.filter_by(id=self.id).first())
+        DeckStats.apply_card_delta(self.deck_id, self.state, -1)
+        db.session.commit()
+
+    @classmethod
+    def bulk_delete(cls, card_ids, user_id):
+        """
+        Delete a user's cards with set based, chunked statements in a single
+        transaction. Ids of missing cards or cards owned by other users are
+        ignored.
+        :return: The number of deleted cards and the ids of their decks
+        :rtype: tuple
+        """
+        deleted, deck_ids = 0, set()
+        for chunk in chunks(list(card_ids), BULK_CHUNK_SIZE):
+            owned = cls.query.filter(cls.id.in_(chunk), cls.user_id == user_id)
+            counts = (
+                db.session.query(cls.deck_id, cls.state, func.count(cls.id))
+                .filter(cls.id.in_(chunk), cls.user_id == user_id)
+                .group_by(cls.deck_id, cls.state)
+                .all()
+            )
+            if not counts:
+                continue
+            owned_ids = owned.with_entities(cls.id).subquery()
+            for model in (StudyQueueItem, StudySessionLog):
+                model.query.filter(model.card_id.in_(owned_ids)).delete(
+                    synchronize_session=False
+                )
+            deleted += owned.delete(synchronize_session=False)
+            for deck_id, state, count in counts:
+                DeckStats.apply_card_delta(deck_id, state, -count)
+                deck_ids.add(deck_id)
+        db.session.commit()
+        return deleted, deck_ids
+
     @property
     def short_front(self):
         return self.front[:50] if len(self.front) > 50 else self.front
@@ -279,35 +773,151 @@ class Card(TimestampedModel):
             deck_id=self.deck_id,
         )
 
+    def review(self, answer, reviewed_at=None):
+        """
+        Reschedule the card's next review from a study session answer.
+        Does not commit, callers own the transaction.
+        :param answer: Known or Unknown
+        :type answer: str
+        """
+        self.repetitions, self.interval_days, self.ease_factor = sm2(
+            ANSWER_QUALITY[answer],
+            self.repetitions or 0,
+            self.interval_days or 0,
+            self.ease_factor or DEFAULT_EASE_FACTOR,
+        )
+        reviewed_at = reviewed_at or datetime.now(timezone.utc)
+        self.next_review_at = reviewed_at + timedelta(days=self.interval_days)
+
+    @classmethod
+    def due(cls, user_id, deck_id=None):
+        """
+        Query a user's cards that are due for review, most overdue first.
+        A range scan on the (user_id|deck_id, state, next_review_at) indexes
+        """
+        query = cls.query.filter(
+            cls.user_id == user_id,
+            cls.state == "Active",
+            cls.next_review_at <= func.now(),
+        )
+        if deck_id is not None:
+            query = query.filter(cls.deck_id == deck_id)
+        return query.order_by(cls.next_review_at)
+
+    @classmethod
+    def due_page(cls, user_id, deck_id=None, cursor=None, limit=50):
+        """
+        A page of a user's due cards, most overdue first, with keyset
+        pagination on (next_review_at, id). Like page(), card backs are not
+        loaded.
+        :param cursor: The next_cursor of the previous page
+        :type cursor: str | None
+        :return: The page's rows and the cursor of the next page, None on
+            the last page
+        :rtype: tuple
+        """
+        query = (
+            db.session.query(
+                cls.id,
+                func.substr(cls.front, 1, 50).label("short_front"),
+                cls.deck_id,
+                Deck.name.label("deck_name"),
+                cls.next_review_at,
+            )
+            .join(Deck, Deck.id == cls.deck_id)
+            .filter(
+                cls.user_id == user_id,
+                cls.state == "Active",
+                cls.next_review_at <= func.now(),
+            )
+        )
+        if deck_id is not None:
+            query = query.filter(cls.deck_id == deck_id)
+        if cursor is not None:
+            review_at, card_id = decode_cursor(cursor)
+            review_at = literal(review_at, type_=TIMESTAMP_PARAM)
+            query = query.filter(
+                (cls.next_review_at > review_at)
+                | and_(cls.next_review_at == review_at, cls.id > card_id)
+            )
+        rows = (
+            query.order_by(cls.next_review_at.asc(), cls.id.asc())
+            .limit(limit + 1)
+            .all()
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].next_review_at, rows[-1].id)
+        return rows, next_cursor
+
+    @classmethod
+    def page(cls, user_id, deck_id=None, state=None, cursor=None, limit=50):
+        """
+        A page of a user's cards, newest first, with keyset pagination on
+        (date_created, id). Only list columns are loaded, card backs are not.
+        :param cursor: The next_cursor of the previous page
+        :type cursor: str | None
+        :return: The page's rows and the cursor of the next page, None on
+            the last page
+        :rtype: tuple
+        """
+        query = (
+            db.session.query(
+                cls.id,
+                func.substr(cls.front, 1, 50).label("short_front"),
+                cls.state,
+                cls.deck_id,
+                Deck.name.label("deck_name"),
+                cls.date_created,
+            )
+            .join(Deck, Deck.id == cls.deck_id)
+            .filter(cls.user_id == user_id)
+        )
+        if deck_id is not None:
+            query = query.filter(cls.deck_id == deck_id)
+        if state is not None:
+            query = query.filter(cls.state == state)
+        if cursor is not None:
+            created, card_id = decode_cursor(cursor)
+            created = literal(created, type_=TIMESTAMP_PARAM)
+            query = query.filter(
+                (cls.date_created < created)
+                | and_(cls.date_created == created, cls.id < card_id)
+            )
+        rows = (
+            query.order_by(cls.date_created.desc(), cls.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].date_created, rows[-1].id)
+        return rows, next_cursor
+
     @classmethod
     def get_next_card(cls, study_session_id, deck_id):
+        cards = cls.get_next_cards(study_session_id, deck_id, limit=1)
+        return cards[0] if cards else None
+
+    @classmethod
+    def get_next_cards(cls, study_session_id, deck_id, limit=1):
+        """The next `limit` cards of a study session, in study order"""
         session = StudySession.query.filter_by(
             id=study_session_id, user_id=g.user.id, deck_id=deck_id, state="Studying"
         ).first()
         if session is None:
             abort(404)
-        study_logs = db.session.query(StudySessionLog.card_id).filter_by(
-            study_session_id=session.id
-        )
-        study_plan = db.session.query(StudyPlan).filter_by(user_id=g.user.id).first()
-        ordering = func.random()
-        if study_plan:
-            if study_plan.order.value == "latest":
-                ordering = Card.date_created.desc()
-            elif study_plan.order.value == "oldest":
-                ordering = Card.date_created.asc()
-        card = (
-            db.session.query(Card)
-            .filter(
-                Card.state == "Active",
-                Card.user_id == g.user.id,
-                Card.deck_id == session.deck_id,
-                ~(Card.id.in_(study_logs)),
-            )
-            .order_by(ordering)
-            .first()
-        )
-        return card
+        cards = session.peek_cards(limit)
+        if not cards:
+            # Pick up cards added to the deck since the queue was built,
+            # or build the queue of a session that does not have one yet
+            study_plan = StudyPlan.current(g.user.id)
+            session.build_queue(**StudyPlan.queue_options(study_plan))
+            db.session.commit()
+            cards = session.peek_cards(limit)
+        return cards
 
 
 class StudyPlan(TimestampedModel):
@@ -321,10 +931,22 @@ class StudyPlan(TimestampedModel):
         db.Enum(OrderTypeEnum), default=OrderTypeEnum.oldest, nullable=False
     )
     see_solved = db.Column(db.Boolean(), default=False)
+    study_type = db.Column(
+        db.Enum(StudyTypeEnum), default=StudyTypeEnum.one_off, nullable=False
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
 
     user = db.relationship(User, backref=backref("study_plans", cascade="all,delete"))
 
+    __table_args__ = (
+        db.Index(
+            "ix_study_plans_user_id_state_date_created",
+            "user_id",
+            "state",
+            "date_created",
+        ),
+    )
+
     def __init__(self, **kwargs):
         """Initialize a study plan"""
         user = False
@@ -347,7 +969,28 @@ class StudyPlan(TimestampedModel):
             name=self.name,
             description=self.description,
             user=self.user_id,
-            order=self.order.value,
+            order=OrderTypeEnum(self.order).value,
+            study_type=StudyTypeEnum(self.study_type).value,
+        )
+
+    @staticmethod
+    def queue_options(study_plan):
+        """StudySession.build_queue arguments for a study plan"""
+        if study_plan is None:
+            return {}
+        return dict(
+            order=study_plan.order,
+            due_only=StudyTypeEnum(study_plan.study_type)
+            == StudyTypeEnum.spaced_repetition,
+        )
+
+    @classmethod
+    def current(cls, user_id):
+        """The study plan applied to a user's study sessions"""
+        return (
+            cls.query.filter_by(user_id=user_id, state="Active")
+            .order_by(cls.date_created.desc())
+            .first()
         )
 
     @classmethod
@@ -381,6 +1024,9 @@ class StudySession(TimestampedModel):
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     known = db.Column(db.Integer, nullable=True, default=0)
     unknown = db.Column(db.Integer, nullable=True, default=0)
+    seed = db.Column(db.BigInteger)
+    # Also study the cards of all of the deck's sub decks
+    include_subdecks = db.Column(db.Boolean, nullable=False, default=False)
 
     deck = db.relationship(
         Deck, backref=backref("study_sessions", cascade="all,delete")
@@ -389,14 +1035,190 @@ class StudySession(TimestampedModel):
         User, backref=backref("study_sessions", cascade="all,delete")
     )
 
+    __table_args__ = (
+        db.Index(
+            "ix_study_sessions_user_id_deck_id_state_date_updated",
+            "user_id",
+            "deck_id",
+            "state",
+            "date_updated",
+        ),
+    )
+
     def __init__(self, **kwargs):
         """Initialize a Study Session"""
         super(StudySession, self).__init__(**kwargs)
 
     def save(self):
         db.session.add(self)
+        DeckStats.record_session(self)
+        db.session.commit()
+
+    def update(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        DeckStats.record_session(self)
         db.session.commit()
 
+    def build_queue(self, order=None, due_only=False):
+        """
+        (Re)build the ordered queue of cards left to study in this session.
+        Cards are numbered by a single INSERT ... SELECT so the deck is only
+        sorted once per session instead of once per answer. The random order
+        is shuffled in Python and inserted with a single executemany.
+        Does not commit, callers own the transaction.
+        :param order: The StudyPlan order, random if not set
+        :type order: OrderTypeEnum | str | None
+        :param due_only: Only queue cards due for review, most overdue first
+        :type due_only: bool
+        """
+        order = OrderTypeEnum(order) if order else OrderTypeEnum.random
+        if due_only:
+            ordering = (Card.next_review_at.asc(), Card.id.asc())
+        elif order == OrderTypeEnum.latest:
+            ordering = (Card.date_created.desc(), Card.id.desc())
+        elif order == OrderTypeEnum.oldest:
+            ordering = (Card.date_created.asc(), Card.id.asc())
+        study_logs = db.session.query(StudySessionLog.card_id).filter_by(
+            study_session_id=self.id
+        )
+        StudyQueueItem.query.filter_by(study_session_id=self.id).delete(
+            synchronize_session=False
+        )
+        if self.include_subdecks:
+            subtree = Deck.subtree_cte([self.deck_id])
+            in_deck = Card.deck_id.in_(db.session.query(subtree.c.id))
+        else:
+            in_deck = Card.deck_id == self.deck_id
+        conditions = [
+            Card.state == "Active",
+            Card.user_id == self.user_id,
+            in_deck,
+            ~(Card.id.in_(study_logs)),
+        ]
+        if due_only:
+            conditions.append(Card.next_review_at <= func.now())
+        elif order == OrderTypeEnum.random:
+            card_ids = sorted(
+                (card_id for card_id, in db.session.query(Card.id).filter(*conditions)),
+                key=self.shuffle_key,
+            )
+            if card_ids:
+                db.session.execute(
+                    StudyQueueItem.__table__.insert(),
+                    [
+                        dict(study_session_id=self.id, position=position, card_id=id)
+                        for position, id in enumerate(card_ids, 1)
+                    ],
+                )
+            return
+        cards = select(
+            [
+                literal(self.id),
+                func.row_number().over(order_by=ordering),
+                Card.id,
+            ]
+        ).where(and_(*conditions))
+        db.session.execute(
+            StudyQueueItem.__table__.insert().from_select(
+                ["study_session_id", "position", "card_id"], cards
+            )
+        )
+
+    def shuffle_key(self, card_id):
+        """
+        Sort key of a card in the random study order, a hash of the card id
+        seeded per session. The order is reproducible and the cards left keep
+        their relative order when the queue is rebuilt
+        :type card_id: int
+        :rtype: bytes
+        """
+        if not self.seed:
+            self.seed = random.randrange(1, 2 ** 32)
+        return hashlib.blake2b(
+            f"{self.seed}:{card_id}".encode(), digest_size=8
+        ).digest()
+
+    def peek_cards(self, limit=1):
+        """The first `limit` cards of this session's study queue"""
+        return (
+            db.session.query(Card)
+            .join(StudyQueueItem, StudyQueueItem.card_id == Card.id)
+            .filter(
+                StudyQueueItem.study_session_id == self.id,
+                Card.state == "Active",
+            )
+            .order_by(StudyQueueItem.position)
+            .limit(limit)
+            .all()
+        )
+
+    def peek_card(self):
+        """The card at the head of this session's study queue"""
+        cards = self.peek_cards(limit=1)
+        return cards[0] if cards else None
+
+    def dequeue(self, *card_ids):
+        """Pop answered cards from this session's study queue"""
+        StudyQueueItem.query.filter(
+            StudyQueueItem.study_session_id == self.id,
+            StudyQueueItem.card_id.in_(card_ids),
+        ).delete(synchronize_session=False)
+
+    def record_answers(self, answers):
+        """
+        Record a batch of answers in a single transaction: the study session
+        logs, the cards' review schedules, the study queue and the
+        known/unknown counters. Cards already answered in this session are
+        skipped so clients can safely retry a batch.
+        :param answers: (card_id, state, answered_at) tuples, where state is
+            Known or Unknown and answered_at an aware UTC datetime or None
+        :type answers: list
+        :return: The number of recorded answers
+        :rtype: int
+        """
+        if not answers:
+            return 0
+        card_ids = {int(card_id) for card_id, _, _ in answers}
+        cards = {
+            card.id: card
+            for card in Card.query.filter(
+                Card.id.in_(card_ids), Card.user_id == self.user_id
+            )
+        }
+        if len(cards) != len(card_ids):
+            abort(404)
+        answered = {
+            card_id
+            for card_id, in db.session.query(StudySessionLog.card_id).filter(
+                StudySessionLog.study_session_id == self.id,
+                StudySessionLog.card_id.in_(card_ids),
+            )
+        }
+        counters = {"Known": 0, "Unknown": 0}
+        for card_id, state, answered_at in answers:
+            card_id = int(card_id)
+            if card_id in answered:
+                continue
+            answered.add(card_id)
+            answered_at = answered_at or datetime.now(timezone.utc)
+            db.session.add(
+                StudySessionLog(
+                    study_session_id=self.id,
+                    card_id=card_id,
+                    state=state,
+                    date_created=answered_at,
+                )
+            )
+            cards[card_id].review(state, reviewed_at=answered_at)
+            counters[state] += 1
+        self.dequeue(*card_ids)
+        self.update(
+            known=StudySession.known + counters["Known"],
+            unknown=StudySession.unknown + counters["Unknown"],
+        )
+        return counters["Known"] + counters["Unknown"]
+
     @property
     def to_json(self):
         return dict(
@@ -406,6 +1228,7 @@ class StudySession(TimestampedModel):
             user_id=self.user_id,
             known=self.known,
             unknown=self.unknown,
+            include_subdecks=self.include_subdecks,
         )
 
     def __repr__(self):
@@ -427,9 +1250,294 @@ class StudySessionLog(TimestampedModel):
         StudySession, backref=backref("study_session_logs", cascade="all,delete")
     )
 
+    __table_args__ = (
+        db.Index(
+            "ix_study_session_logs_study_session_id_card_id",
+            "study_session_id",
+            "card_id",
+        ),
+    )
+
     def __init__(self, **kwargs):
         """Initialize a Study Session Log"""
         super(StudySessionLog, self).__init__(**kwargs)
 
     def __repr__(self):
         return f"<StudySessionLog: {self.study_session.deck.name} - {self.state}>"
+
+
+class ImportJob(TimestampedModel):
+    """
+    A CSV/TSV card import, processed outside the request cycle by
+    `flask import-worker`. State goes Pending -> Running -> Complete|Failed
+    """
+
+    __tablename__ = "import_jobs"
+    __table_args__ = (db.Index("ix_import_jobs_state_id", "state", "id"),)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    deck_id = db.Column(db.Integer, db.ForeignKey("decks.id"), nullable=False)
+    file_path = db.Column(db.String, nullable=False)
+    delimiter = db.Column(db.String(1), nullable=False, default=",")
+    # Columns are header names or 0-based indexes
+    front_column = db.Column(db.String(100), nullable=False, default="0")
+    back_column = db.Column(db.String(100), nullable=False, default="1")
+    deck_column = db.Column(db.String(100))
+    has_header = db.Column(db.Boolean, default=False)
+    imported = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text)
+    message = db.Column(db.String)
+
+    user = db.relationship(User, backref=backref("import_jobs", cascade="all,delete"))
+    deck = db.relationship(Deck, backref=backref("import_jobs", cascade="all,delete"))
+
+    def __init__(self, **kwargs):
+        """Initialize an import job"""
+        super(ImportJob, self).__init__(**kwargs)
+
+    def __repr__(self):
+        return f"<ImportJob: {self.id} - {self.state}>"
+
+    @property
+    def to_json(self):
+        return dict(
+            id=self.id,
+            state=self.state,
+            deck_id=self.deck_id,
+            imported=self.imported,
+            failed=self.failed,
+            errors=json.loads(self.errors) if self.errors else [],
+            message=self.message,
+            date_created=self.date_created,
+            date_updated=self.date_updated,
+        )
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Atomically move the oldest Pending job to Running, so concurrent
+        workers never pick the same job
+        :return: The claimed job, if any
+        """
+        pending = cls.query.filter_by(state="Pending").order_by(cls.id)
+        for job_id, in pending.with_entities(cls.id).limit(10):
+            claimed = cls.query.filter_by(id=job_id, state="Pending").update(
+                {cls.state: "Running"}, synchronize_session=False
+            )
+            db.session.commit()
+            if claimed:
+                job = cls.query.get(job_id)
+                db.session.refresh(job)
+                return job
+        return None
+
+
+class StudyQueueItem(db.Model):
+    """
+    A card waiting to be studied in a study session, in study plan order.
+    Answered cards are popped off so the next card is an index seek on
+    (study_session_id, position).
+    """
+
+    __tablename__ = "study_queue"
+
+    study_session_id = db.Column(
+        db.Integer, db.ForeignKey("study_sessions.id"), primary_key=True
+    )
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    card_id = db.Column(
+        db.Integer, db.ForeignKey("cards.id", ondelete="CASCADE"), nullable=False
+    )
+    study_session = db.relationship(
+        StudySession,
+        backref=backref(
+            "queue", cascade="all,delete", order_by="StudyQueueItem.position"
+        ),
+    )
+
+    __table_args__ = (
+        db.Index("ix_study_queue_study_session_id_card_id", study_session_id, card_id),
+    )
+
+    def __repr__(self):
+        return f"<StudyQueueItem: {self.study_session_id} - {self.position}>"
+
+
+class DeckStats(db.Model):
+    """
+    Denormalized per-deck statistics.
+    Kept up to date in the same transaction as the card, deck and study session
+    writes that affect them. Use `flask rebuild-deck-stats` to recompute.
+    """
+
+    __tablename__ = "deck_stats"
+
+    deck_id = db.Column(db.Integer, db.ForeignKey("decks.id"), primary_key=True)
+    card_count = db.Column(db.Integer, nullable=False, default=0)
+    active_count = db.Column(db.Integer, nullable=False, default=0)
+    solved_count = db.Column(db.Integer, nullable=False, default=0)
+    disabled_count = db.Column(db.Integer, nullable=False, default=0)
+    child_count = db.Column(db.Integer, nullable=False, default=0)
+    last_session_id = db.Column(db.Integer)
+    known = db.Column(db.Integer)
+    unknown = db.Column(db.Integer)
+    last_studied = db.Column(db.DateTime(timezone=True))
+
+    deck = db.relationship(
+        Deck, backref=backref("stats", uselist=False, cascade="all,delete")
+    )
+
+    # States are matched in any case, decks used to be reset to e.g "solved"
+    state_columns = {
+        "active": "active_count",
+        "solved": "solved_count",
+        "disabled": "disabled_count",
+    }
+
+    def __repr__(self):
+        return f"<DeckStats: {self.deck_id} - {self.card_count} cards>"
+
+    @classmethod
+    def state_column(cls, state):
+        """The per-state counter column for a card state, if it has one"""
+        column = cls.state_columns.get((state or "Active").lower())
+        return getattr(cls, column) if column else None
+
+    @classmethod
+    def apply_card_delta(cls, deck_id, state, delta):
+        """Add delta cards in the given state to a deck's counters"""
+        if not deck_id or not delta:
+            return
+        values = {cls.card_count: cls.card_count + delta}
+        column = cls.state_column(state)
+        if column is not None:
+            values[column] = column + delta
+        updated = cls.query.filter_by(deck_id=deck_id).update(
+            values, synchronize_session="evaluate"
+        )
+        if not updated:
+            cls.rebuild([deck_id])
+
+    @classmethod
+    def apply_child_delta(cls, deck_id, delta):
+        """Add delta to a deck's child deck counter"""
+        if not deck_id or not delta:
+            return
+        updated = cls.query.filter_by(deck_id=deck_id).update(
+            {cls.child_count: cls.child_count + delta},
+            synchronize_session="evaluate",
+        )
+        if not updated:
+            cls.rebuild([deck_id])
+
+    @classmethod
+    def reset_states(cls, deck_ids, state):
+        """Count every card of the given decks as being in `state`"""
+        target = cls.state_column(state)
+        columns = [getattr(cls, name) for name in cls.state_columns.values()]
+        cls.query.filter(cls.deck_id.in_(deck_ids)).update(
+            {
+                column: cls.card_count if column is target else 0
+                for column in columns
+            },
+            synchronize_session=False,
+        )
+
+    @classmethod
+    def record_session(cls, study_session):
+        """
+        Make study_session the latest session in its deck's stats. Sessions
+        including sub decks count cards outside of the deck's card_count,
+        they are left out of its stats
+        """
+        if study_session.include_subdecks:
+            return
+        db.session.flush()
+        updated = cls.query.filter_by(deck_id=study_session.deck_id).update(
+            {
+                cls.last_session_id: study_session.id,
+                cls.known: study_session.known,
+                cls.unknown: study_session.unknown,
+                cls.last_studied: func.now(),
+            },
+            synchronize_session="fetch",
+        )
+        if not updated:
+            cls.rebuild([study_session.deck_id])
+
+    @classmethod
+    def rebuild(cls, deck_ids=None):
+        """
+        Recompute the stats of the given decks, or of every deck, from the
+        cards, decks and study_sessions tables.
+        Does not commit, callers own the transaction.
+        :return: The number of rebuilt rows
+        """
+        decks = db.session.query(Deck.id, Deck.user_id)
+        stats = cls.query
+        if deck_ids is not None:
+            deck_ids = [int(i) for i in deck_ids]
+            decks = decks.filter(Deck.id.in_(deck_ids))
+            stats = stats.filter(cls.deck_id.in_(deck_ids))
+        stats.delete(synchronize_session=False)
+        rows = {
+            deck_id: dict(deck_id=deck_id, child_count=0, card_count=0)
+            for deck_id, _ in decks
+        }
+        if not rows:
+            return 0
+
+        state = func.lower(func.coalesce(Card.state, "active"))
+        card_counts = db.session.query(
+            Card.deck_id,
+            func.count(Card.id),
+            *[
+                func.sum(case([(state == name, 1)], else_=0))
+                for name in cls.state_columns
+            ],
+        ).group_by(Card.deck_id)
+        child_counts = db.session.query(Deck.parent_id, func.count(Deck.id)).group_by(
+            Deck.parent_id
+        )
+        latest_session = (
+            db.session.query(StudySession.id)
+            .filter(
+                StudySession.deck_id == Deck.id,
+                StudySession.user_id == Deck.user_id,
+                StudySession.include_subdecks.is_(False),
+            )
+            .order_by(StudySession.date_updated.desc(), StudySession.id.desc())
+            .limit(1)
+            .correlate(Deck)
+            .as_scalar()
+        )
+        sessions = db.session.query(
+            Deck.id,
+            StudySession.id,
+            StudySession.known,
+            StudySession.unknown,
+            StudySession.date_updated,
+        ).join(StudySession, StudySession.id == latest_session)
+        if deck_ids is not None:
+            card_counts = card_counts.filter(Card.deck_id.in_(deck_ids))
+            child_counts = child_counts.filter(Deck.parent_id.in_(deck_ids))
+            sessions = sessions.filter(Deck.id.in_(deck_ids))
+
+        for deck_id, total, *by_state in card_counts:
+            if deck_id in rows:
+                rows[deck_id]["card_count"] = total
+                for column, count in zip(cls.state_columns.values(), by_state):
+                    rows[deck_id][column] = count or 0
+        for parent_id, count in child_counts:
+            if parent_id in rows:
+                rows[parent_id]["child_count"] = count
+        for deck_id, session_id, known, unknown, last_studied in sessions:
+            rows[deck_id].update(
+                last_session_id=session_id,
+                known=known,
+                unknown=unknown,
+                last_studied=last_studied,
+            )
+        db.session.bulk_insert_mappings(cls, rows.values())
+        return len(rows)
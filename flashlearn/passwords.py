@@ -0,0 +1,88 @@
+"""
+Password hashing off the request thread.
+bcrypt is deliberately slow. Hashes are computed in a small bounded thread
+pool (bcrypt releases the GIL), so a burst of logins queues for the pool
+instead of pinning every worker thread and starving other endpoints.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from flask import current_app, has_app_context
+
+DEFAULT_LOG_ROUNDS = 12
+# bcrypt only uses the first 72 bytes of a password
+MAX_PASSWORD_BYTES = 72
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def executor():
+    """The process' hashing pool, created on first use e.g after forking"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config("PASSWORD_HASH_WORKERS", 2),
+                    thread_name_prefix="password-hash",
+                )
+    return _executor
+
+
+def shutdown():
+    """Stop the hashing pool, a new one is created on next use"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def run(fn, *args):
+    """Run fn in the hashing pool and wait for its result"""
+    future = executor().submit(fn, *args)
+    return future.result(timeout=config("PASSWORD_HASH_TIMEOUT", None))
+
+
+def encode(password):
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured BCRYPT_LOG_ROUNDS cost
+    :type password: str
+    :rtype: str
+    """
+    salt = bcrypt.gensalt(config("BCRYPT_LOG_ROUNDS", DEFAULT_LOG_ROUNDS))
+    return run(bcrypt.hashpw, encode(password), salt).decode("utf-8")
+
+
+def check_password(password, password_hash):
+    """
+    Check a password against its hash
+    :type password: str
+    :type password_hash: str
+    :rtype: bool
+    """
+    try:
+        return run(bcrypt.checkpw, encode(password), password_hash.encode("utf-8"))
+    except ValueError:
+        # Malformed or missing hash
+        return False
+
+
+def needs_rehash(password_hash):
+    """Whether a hash was made with another cost than BCRYPT_LOG_ROUNDS"""
+    try:
+        rounds = int(password_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return True
+    return rounds != config("BCRYPT_LOG_ROUNDS", DEFAULT_LOG_ROUNDS)
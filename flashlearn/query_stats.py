@@ -0,0 +1,132 @@
+"""
+Per-request SQL query accounting.
+When SQL_INSTRUMENTATION is on, engine events count the statements each
+request executes and time them. Requests over SLOW_REQUEST_THRESHOLD or
+SLOW_REQUEST_QUERY_COUNT are logged as one JSON line with their slowest
+statements, and SQL_INSTRUMENTATION_HEADERS adds X-Query-Count and
+Server-Timing headers to every response.
+Statements run after the response is returned, e.g by streamed exports, are
+not counted.
+"""
+import heapq
+import json
+import logging
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("flashlearn")
+
+# Statements kept per request, and the characters logged of each
+SLOWEST_STATEMENTS = 5
+STATEMENT_LOG_LENGTH = 300
+
+
+class QueryStats:
+    """Statements executed during a request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        # Min-heap of (duration, statement), the slowest SLOWEST_STATEMENTS
+        self._slowest = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        if len(self._slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self._slowest, (duration, statement))
+        elif duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (duration, statement))
+
+    @property
+    def slowest(self):
+        """(duration, statement) of the slowest statements, slowest first"""
+        return sorted(self._slowest, reverse=True)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current_stats():
+    if has_request_context():
+        return g.get("query_stats")
+    return None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = conn.info.get("query_started")
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+def handle_error(context):
+    # The failed statement's start time would be popped by the next one
+    if context.connection is not None and context.connection.info.get(
+        "query_started"
+    ):
+        context.connection.info["query_started"].pop()
+
+
+def start_request():
+    g.query_stats = QueryStats()
+
+
+def finish_request(response):
+    """Log slow requests and add the query headers"""
+    stats = current_stats()
+    if stats is None:
+        return response
+    elapsed = stats.elapsed
+    config = current_app.config
+    if config["SQL_INSTRUMENTATION_HEADERS"]:
+        response.headers["X-Query-Count"] = str(stats.count)
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+            f"app;dur={elapsed * 1000:.1f}"
+        )
+    if (
+        elapsed >= config["SLOW_REQUEST_THRESHOLD"]
+        or stats.count >= config["SLOW_REQUEST_QUERY_COUNT"]
+    ):
+        slowest = [
+            dict(
+                ms=round(duration * 1000, 1),
+                statement=" ".join(statement.split())[:STATEMENT_LOG_LENGTH],
+            )
+            for duration, statement in stats.slowest
+        ]
+        log_line = dict(
+            method=request.method,
+            path=request.path,
+            endpoint=request.endpoint,
+            status=response.status_code,
+            duration_ms=round(elapsed * 1000, 1),
+            queries=stats.count,
+            db_ms=round(stats.duration * 1000, 1),
+            slowest=slowest,
+        )
+        logger.warning("Slow request %s", json.dumps(log_line))
+    return response
+
+
+def init_app(app):
+    """Instrument the app's requests when SQL_INSTRUMENTATION is on"""
+    if not app.config["SQL_INSTRUMENTATION"]:
+        return
+    # Engines are created lazily by Flask-SQLAlchemy, listen to all of them
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(Engine, "handle_error", handle_error)
+    app.before_request(start_request)
+    app.after_request(finish_request)
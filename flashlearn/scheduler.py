@@ -0,0 +1,38 @@
+"""
+SM-2 spaced repetition scheduling.
+See https://www.supermemo.com/en/archives1990-2015/english/ol/sm2
+"""
+
+DEFAULT_EASE_FACTOR = 2.5
+MIN_EASE_FACTOR = 1.3
+
+# Recall quality (0 - 5) given to each study session answer
+ANSWER_QUALITY = {"Known": 4, "Unknown": 1}
+
+
+def sm2(quality, repetitions, interval, ease_factor):
+    """
+    Compute a card's next review schedule after an answer
+    :param quality: Recall quality, from 0 (blackout) to 5 (perfect recall)
+    :type quality: int
+    :param repetitions: Number of consecutive successful reviews so far
+    :type repetitions: int
+    :param interval: Current interval between reviews, in days
+    :type interval: int
+    :param ease_factor: Current ease factor of the card
+    :type ease_factor: float
+    :return: The new (repetitions, interval, ease_factor)
+    :rtype: tuple
+    """
+    if quality >= 3:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(interval * ease_factor)
+        repetitions += 1
+    else:
+        repetitions, interval = 0, 1
+    ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return repetitions, interval, max(MIN_EASE_FACTOR, ease_factor)
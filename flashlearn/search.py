@@ -0,0 +1,136 @@
+"""
+Full-text card search.
+Card fronts and backs are indexed by an FTS5 table on SQLite, kept in sync
+with `cards` by triggers, and by a GIN index over their tsvector on
+Postgres. Either way every write path, bulk statements included, keeps the
+index up to date without application code.
+"""
+import re
+from sqlalchemy import DDL, event, text
+from flashlearn import db
+from flashlearn.models import Card
+
+SEARCH_PAGE_SIZE = 20
+# Postgres full-text document, the GIN index and the queries must use the
+# exact same expression for the planner to pick the index
+PG_DOCUMENT = "to_tsvector('english', cards.front || ' ' || cards.back)"
+
+SQLITE_DDL = (
+    # prefix='2 3' indexes 2 and 3 character prefixes, for fast prefix queries
+    "CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(front, back, user_id,"
+    " content='cards', content_rowid='id', tokenize='porter unicode61',"
+    " prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_ai AFTER INSERT ON cards BEGIN"
+    " INSERT INTO cards_fts(rowid, front, back, user_id)"
+    " VALUES (new.id, new.front, new.back, new.user_id);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_ad AFTER DELETE ON cards BEGIN"
+    " INSERT INTO cards_fts(cards_fts, rowid, front, back, user_id)"
+    " VALUES ('delete', old.id, old.front, old.back, old.user_id);"
+    " END",
+    # Only text edits touch the index, not state or review schedule updates
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_au AFTER UPDATE OF front, back ON cards"
+    " BEGIN"
+    " INSERT INTO cards_fts(cards_fts, rowid, front, back, user_id)"
+    " VALUES ('delete', old.id, old.front, old.back, old.user_id);"
+    " INSERT INTO cards_fts(rowid, front, back, user_id)"
+    " VALUES (new.id, new.front, new.back, new.user_id);"
+    " END",
+)
+POSTGRES_DDL = (
+    f"CREATE INDEX IF NOT EXISTS ix_cards_search ON cards USING gin ({PG_DOCUMENT})",
+)
+
+for statement in SQLITE_DDL:
+    event.listen(
+        Card.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+for statement in POSTGRES_DDL:
+    event.listen(
+        Card.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql")
+    )
+event.listen(
+    Card.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS cards_fts").execute_if(dialect="sqlite"),
+)
+
+
+def search_terms(query):
+    """The words of a search query, punctuation and operators dropped"""
+    return re.findall(r"\w+", query or "")
+
+
+def fts5_query(terms, user_id):
+    """
+    An FTS5 MATCH expression requiring every term in a card's front or back,
+    the last one as a prefix so results show up while the user is still
+    typing. Matching the indexed user_id too narrows the search down to the
+    user's cards inside the index, instead of filtering every user's matches
+    """
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return f'{{front back}} : ({" ".join(quoted)}) AND user_id : "{user_id}"'
+
+
+def search_cards(user_id, query, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Search a user's cards, best matches first
+    :param query: The search text, every word has to match
+    :type query: str
+    :param page: 1-based page number
+    :type page: int
+    :return: The page's (id, short_front, state, deck_id, deck_name, rank)
+        rows and whether there is a next page
+    :rtype: tuple
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    # One extra row tells if there is a next page
+    params = dict(user_id=user_id, limit=per_page + 1, offset=(page - 1) * per_page)
+    if db.engine.dialect.name == "sqlite":
+        # bm25() is lower for better matches, fronts weigh more than backs
+        # and the user_id column is left out of the ranking. Matches are
+        # ranked and paginated inside the index, only the page is joined
+        sql = """
+            SELECT cards.id, substr(cards.front, 1, 50) AS short_front,
+                cards.state, cards.deck_id, decks.name AS deck_name,
+                -matches.score AS rank
+            FROM (
+                SELECT rowid, bm25(cards_fts, 2.0, 1.0, 0.0) AS score
+                FROM cards_fts
+                WHERE cards_fts MATCH :query
+                ORDER BY score, rowid
+                LIMIT :limit OFFSET :offset
+            ) AS matches
+            JOIN cards ON cards.id = matches.rowid
+            JOIN decks ON decks.id = cards.deck_id
+            WHERE cards.user_id = :user_id
+            ORDER BY matches.score, cards.id
+        """
+        params["query"] = fts5_query(terms, user_id)
+    else:
+        sql = f"""
+            SELECT cards.id, substr(cards.front, 1, 50) AS short_front,
+                cards.state, cards.deck_id, decks.name AS deck_name,
+                ts_rank({PG_DOCUMENT}, query) AS rank
+            FROM cards
+            JOIN decks ON decks.id = cards.deck_id,
+                plainto_tsquery('english', :query) AS query
+            WHERE {PG_DOCUMENT} @@ query AND cards.user_id = :user_id
+            ORDER BY rank DESC, cards.id
+            LIMIT :limit OFFSET :offset
+        """
+        params["query"] = " ".join(terms)
+    rows = db.session.execute(text(sql), params).fetchall()
+    return rows[:per_page], len(rows) > per_page
+
+
+def rebuild_search_index():
+    """Reindex every card, e.g after restoring the cards table"""
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(text("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')"))
+    else:
+        db.session.execute(text("REINDEX INDEX ix_cards_search"))
+    db.session.commit()
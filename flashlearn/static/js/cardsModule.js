@@ -107,8 +107,147 @@ var cardsModule = (function () {
         });
     }
 
+    // Cards page state, rows are fetched a page at a time from /cards/page,
+    // or from /cards/search while there is a search query
+    let nextCursor = null;
+    let searchQuery = "";
+    let searchPage = 1;
+    let searchTimeout = null;
+
+    function escapeHtml(text) {
+        return $("<div/>").text(text).html();
+    }
+
+    function cardRow(card) {
+        return [
+            "",
+            escapeHtml(card.short_front),
+            escapeHtml(card.deck_name),
+            card.state,
+            moment(new Date(card.date_created)).format("LLL"),
+            `<div class="dropdown custom-dropdown">
+                <a data-toggle="dropdown"
+                    class="btn btn-sm mr-2 text-decoration-none text-secondary dropdown_hover">
+                    <i class="fas fa-ellipsis-h"></i>
+                </a>
+                <div class=" dropdown-menu dropdown-menu-right" aria-labelledby="dropdownMenuButton">
+                    <a class="dropdown-item" data-toggle="modal" href="#edit-card-modal"
+                        card-id="${card.id}">
+                        <i class="fa fa-edit mr-2"></i> Edit
+                    </a>
+                    <a class="dropdown-item text-danger delete-card"
+                        onclick="deleteItem('Card', ${card.id})" card-id="${card.id}">
+                        <i class="fa fa-trash mr-2"></i> Delete
+                    </a>
+                </div>
+            </div>`,
+            card.id,
+        ];
+    }
+
+    /**
+     * Append the next page of cards to the cards table
+     * @param {boolean} reset Start over from the first page, e.g when the
+     * state filter changes
+     * @return {void} Returns nothing
+     */
+    function loadCards(reset = false) {
+        const table = $("#allCardsDt");
+        const dt = table.DataTable();
+        const params = { limit: table.data("page-size") };
+        const state = $("#cards_state").val();
+        if (state) {
+            params.state = state;
+        }
+        if (!reset && nextCursor) {
+            params.cursor = nextCursor;
+        }
+        $.ajax({
+            url: "/cards/page",
+            method: "GET",
+            data: params,
+            success: function (res) {
+                if (reset) {
+                    dt.clear();
+                }
+                dt.rows.add(res["cards"].map(cardRow)).draw(false);
+                nextCursor = res["next_cursor"];
+                $("#load-more-cards").toggleClass("d-none", !nextCursor);
+            },
+            error: function (err) {
+                Toast.fire({
+                    icon: "error",
+                    title: `Failed to load cards. Try again later`,
+                });
+            },
+        });
+    }
+
+    /**
+     * Show the next page of full-text search results in the cards table
+     * @param {boolean} reset Start over from the first page of results
+     * @return {void} Returns nothing
+     */
+    function searchCards(reset = false) {
+        const table = $("#allCardsDt");
+        const dt = table.DataTable();
+        searchPage = reset ? 1 : searchPage + 1;
+        $.ajax({
+            url: "/cards/search",
+            method: "GET",
+            data: {
+                q: searchQuery,
+                page: searchPage,
+                per_page: table.data("page-size"),
+            },
+            success: function (res) {
+                if (reset) {
+                    dt.clear();
+                }
+                // Keep the ranked order instead of sorting by column
+                dt.order([]);
+                dt.rows.add(res["cards"].map(cardRow)).draw(false);
+                $("#load-more-cards").toggleClass("d-none", !res["has_next"]);
+            },
+            error: function (err) {
+                Toast.fire({
+                    icon: "error",
+                    title: `Failed to search cards. Try again later`,
+                });
+            },
+        });
+    }
+
+    function loadMore() {
+        if (searchQuery) {
+            searchCards();
+        } else {
+            loadCards();
+        }
+    }
+
     function init() {
         bindEvents();
+        if ($("#allCardsDt").length) {
+            $("#load-more-cards").click(loadMore);
+            $("#cards_state").change(() => loadCards(true));
+            // Search on the server instead of filtering the loaded rows
+            $("#datatableSearch")
+                .off("keyup")
+                .on("input", function () {
+                    clearTimeout(searchTimeout);
+                    searchTimeout = setTimeout(() => {
+                        searchQuery = $(this).val().trim();
+                        $("#cards_state").prop("disabled", !!searchQuery);
+                        if (searchQuery) {
+                            searchCards(true);
+                        } else {
+                            loadCards(true);
+                        }
+                    }, 300);
+                });
+            loadCards(true);
+        }
     }
 
     return {
@@ -138,46 +138,70 @@ $(document).ready(function () {
     });
 
     // Mark Known / Unknown cards
-    $("#known-card, #unknown-card").click((e) => {
-        var source = e.target;
-        var state = "Known";
-        if (source.id == "unknown-card") {
-            state = "Unknown";
+    // Answers are shown against the prefetched card_buffer straight away and
+    // sent to the server in batches, which refill the buffer.
+    var pendingAnswers = [];
+    var answersInFlight = false;
+    var sessionComplete = false;
+
+    function showCard(card) {
+        active_card = card["id"];
+        $(back).css({ display: "none" });
+        $(front).css({ display: "flex" });
+        face = "front";
+        $(".flip-card-front").text(card["front"]);
+        $(".flip-card-back").text(card["back"]);
+        $("#card-legend-text").text(face).fadeIn(0.6);
+        // Add the fadeInRight animation and remove it to ensure subsequent cards will be animated too
+        $(inner).addClass(
+            "animate__animated animate__slideInRight animate__faster"
+        );
+        setTimeout(() => {
+            $(inner).removeClass(
+                "animate__animated animate__slideInRight animate__faster"
+            );
+        }, 300);
+    }
+
+    function showNextCard() {
+        if (card_buffer.length) {
+            showCard(card_buffer.shift());
+            $("#known-card, #unknown-card").prop("disabled", false);
+        } else if (sessionComplete) {
+            $("#flashcards").css({ display: "none" });
+            $("#studySessionComplete").modal("show");
+        } else {
+            active_card = null;
+            $("#known-card, #unknown-card").prop("disabled", true);
         }
+    }
 
-        // Fetch next card in the deck
+    function submitAnswers() {
+        if (answersInFlight || !pendingAnswers.length) {
+            return;
+        }
+        let answers = pendingAnswers;
+        pendingAnswers = [];
+        answersInFlight = true;
         $.ajax({
             method: "POST",
-            url: `/deck/${active_deck}/study/${active_study_session}/next`,
-            data: { card_id: active_card, state: state, "csrf_token": $("#csrf_token").val() },
-            beforeSend: () =>
-                $("#known-card, #unknown-card").prop("disabled", true),
+            url: `/deck/${active_deck}/study/${active_study_session}/answers?batch_size=${study_prefetch + 1}`,
+            contentType: "application/json",
+            data: JSON.stringify(answers),
+            headers: { "X-CSRFToken": $("#csrf_token").val() },
         })
             .done(function (res) {
                 let deck = res["data"]["active_deck"] ?? [];
                 let session = res["data"]["active_study_session"] ?? [];
-                if (res["status"]) {
-                    let card = res["data"]["active_card"];
-                    active_card = card["id"];
-                    $(back).css({ display: "none" });
-                    $(front).css({ display: "flex" });
-                    face = "front";
-                    $(".flip-card-front").text(card["front"]);
-                    $(".flip-card-back").text(card["back"]);
-                    $("#card-legend-text").text(face).fadeIn(0.6);
-                    // Add the fadeInRight animation and remove it to ensure subsequent cards will be animated too
-                    $(inner).addClass(
-                        "animate__animated animate__slideInRight animate__faster"
-                    );
-                    setTimeout(() => {
-                        $(inner).removeClass(
-                            "animate__animated animate__slideInRight animate__faster"
-                        );
-                    }, 300);
-                } else if (res["markup"]) {
-                    $("#flashcards").css({ display: "none" });
+                // Drop cards the user has moved on to or answered meanwhile
+                let seen = pendingAnswers.map((answer) => answer["card_id"]);
+                seen.push(active_card);
+                card_buffer = res["data"]["cards"].filter(
+                    (card) => !seen.includes(card["id"])
+                );
+                if (!res["status"] && res["markup"]) {
+                    sessionComplete = true;
                     $("#studySessionComplete .modal-body").html(res["markup"]);
-                    $("#studySessionComplete").modal("show");
                 }
                 if (deck && session) {
                     $("#study_session_total").text(deck["card_count"]);
@@ -186,16 +210,41 @@ $(document).ready(function () {
                             parseInt(session["unknown"])
                     );
                 }
+                if (active_card === null) {
+                    showNextCard();
+                }
             })
             .fail(() => {
+                // Keep the answers to retry them with the next batch
+                pendingAnswers = answers.concat(pendingAnswers);
                 Toast.fire({
                     icon: "error",
                     title: "Error. Could not fetch next card.",
                 });
+                $("#known-card, #unknown-card").prop("disabled", false);
             })
             .always(() => {
-                $("#known-card, #unknown-card").prop("disabled", false);
+                answersInFlight = false;
+                submitAnswers();
             });
+    }
+
+    $("#known-card, #unknown-card").click((e) => {
+        if (active_card === null) {
+            return;
+        }
+        var source = e.currentTarget;
+        var state = "Known";
+        if (source.id == "unknown-card") {
+            state = "Unknown";
+        }
+        pendingAnswers.push({
+            card_id: parseInt(active_card),
+            state: state,
+            answered_at: new Date().toISOString(),
+        });
+        showNextCard();
+        submitAnswers();
     });
 
     // Add cards to a deck
@@ -269,11 +318,8 @@ function removeFormset(e, formset) {
 // Edit Deck within the deck dt
 function toggleDeckDtModal(deck_id) {
     $.ajax({
-        type: "POST",
-        url: `/deck/${deck_id}`,
-        data: null,
-        contentType: false,
-        processData: false,
+        type: "GET",
+        url: `/deck/${deck_id}/json`,
         success: (data) => {
             // Populate edit deck form..
             $("#editDeckDtModal").find("#name").val(data.name);
@@ -788,6 +834,58 @@ function handleAjax(e, form, item, method, target_url, success_url = null) {
     });
 }
 
+/**
+ * Upload a CSV/TSV file to be imported in the background, then poll the
+ * import job until the worker is done with it
+ * @param {Event} e The Form submit event
+ * @param {HTMLElement} form The import form element
+ * @return {void} Returns nothing
+ */
+function handleFileImport(e, form) {
+    e.preventDefault();
+    let progress = $("#import-progress");
+    let deck_id = $(form).data("deck-id");
+
+    let pollJob = (job_id) => {
+        $.get(`/import/${job_id}`, (job) => {
+            progress.text(
+                `${job.state}: ${job.imported} imported, ${job.failed} failed`
+            );
+            if (job.state === "Pending" || job.state === "Running") {
+                setTimeout(() => pollJob(job_id), 2000);
+            } else if (job.state === "Complete") {
+                Toast.fire({
+                    icon: job.failed ? "warning" : "success",
+                    title: `Imported ${job.imported} cards`,
+                });
+            } else {
+                Toast.fire({
+                    icon: "error",
+                    title: `Import failed: ${job.message}`,
+                });
+            }
+        });
+    };
+
+    $.ajax({
+        type: "POST",
+        url: `/deck/${deck_id}/import/file`,
+        data: new FormData(form),
+        contentType: false,
+        processData: false,
+        success: (data) => {
+            progress.text("Queued");
+            pollJob(data.job.id);
+        },
+        error: () => {
+            Toast.fire({
+                icon: "error",
+                title: "Failed to upload the file. Try again later",
+            });
+        },
+    });
+}
+
 // Select2 Lookup data initializer
 function select2Lookup(selector, placeholder = "Select an option") {
     $(selector).select2({
@@ -1,4 +1,5 @@
 from flask import (
+    current_app,
     jsonify,
     g,
     request,
@@ -10,7 +11,7 @@ from flask import (
     abort,
 )
 from flashlearn.user import user
-from flashlearn.models import User
+from flashlearn.models import User, UserSnapshot
 from flashlearn.decorators import login_required, super_user_required
 
 
@@ -27,6 +28,7 @@ def login():
             error = "Invalid login credentials"
 
         if not error:
+            user.rehash_password(password)
             session.clear()
             session["user_id"] = user.id
             flash(f"Welcome back {username}")
@@ -63,12 +65,20 @@ def register():
 
 @user.before_app_request
 def load_user():
-    """Load authenticated user"""
+    """
+    Load the authenticated user's cached snapshot, the full User is only
+    queried if a view needs more than its id, username and flags
+    """
     user_id = session.get("user_id")
-    if user_id is None:
+    if user_id is None or request.endpoint == "static":
         g.user = None
-    else:
-        g.user = User.query.get_or_404(user_id)
+        return
+    g.user = UserSnapshot.load(
+        user_id, timeout=current_app.config["USER_SNAPSHOT_TIMEOUT"]
+    )
+    if g.user is None:
+        # The user was deleted since logging in
+        session.clear()
 
 
 @user.route("/logout", methods=("GET", "POST"))
@@ -1,3 +1,9 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+
+
 def to_bool(inp):
     """
     Convert 0/1 or true/false to Python bool type
@@ -11,3 +17,55 @@ def to_bool(inp):
     elif inp in ["false", "0", 0, False]:
         return False
     raise ValueError(f"{inp} is not a valid string representation of a boolean value")
+
+
+def parse_datetime(inp):
+    """
+    Parse an ISO 8601 timestamp into an aware UTC datetime, timestamps
+    without an offset are taken as UTC
+    :param inp: The timestamp, e.g 2021-02-16T11:47:46Z
+    :type inp: str
+    """
+    try:
+        value = datetime.fromisoformat(inp.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"{inp} is not a valid ISO 8601 timestamp")
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def chunks(items, size):
+    """
+    Split a list into lists of at most `size` items, e.g to keep
+    `IN (...)` clauses under the database's bound parameter limit
+    :param items: The items to split
+    :type items: list
+    :param size: The maximum chunk size
+    :type size: int
+    """
+    for start in range(0, len(items), size):
+        end = start + size
+        yield items[start:end]
+
+
+def encode_cursor(created, item_id):
+    """
+    Opaque keyset pagination cursor for the row at (created, item_id)
+    :type created: datetime
+    :type item_id: int
+    """
+    data = json.dumps([created.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor
+    :return: A (created, item_id) tuple
+    """
+    try:
+        created, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created), int(item_id)
+    except (AttributeError, TypeError, ValueError, binascii.Error):
+        raise ValueError(f"{cursor} is not a valid cursor")
@@ -18,7 +18,33 @@ class BaseConfig:
         os.getenv("secret_key") or "j^lw01bnhbrl2(k+c626l^n^$hi!&+6xx(ns@m(q*5lj-!xj*9"
     )
     DEBUG = False
-    USE_REDIS_CACHE = False
+    USE_REDIS_CACHE = os.getenv("USE_REDIS_CACHE", "false").lower() in ("1", "true")
+    REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+    # Connections per process, the cache invalidation subscriber holds one
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 10))
+    # Seconds to wait for a free connection, to connect and for replies.
+    # Past them a call fails and counts towards opening the circuit breaker
+    REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 0.5))
+    REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 0.5))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
+    # After this many consecutive Redis errors the cache stops calling Redis
+    # for CACHE_CIRCUIT_RESET_TIMEOUT seconds and each worker caches locally
+    CACHE_CIRCUIT_MAX_FAILURES = 5
+    CACHE_CIRCUIT_RESET_TIMEOUT = 30
+    CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "flashlearn:")
+    CACHE_DEFAULT_TIMEOUT = 300
+    # In-process tier of the cache, in front of Redis when USE_REDIS_CACHE.
+    # Local copies are dropped on invalidation, and after this many seconds
+    # at most in case an invalidation message got lost
+    LOCAL_CACHE_TIMEOUT = 30
+    LOCAL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    # Without Redis, a SQLite file at this path is the cache shared by the
+    # workers of a host. Otherwise every worker caches on its own and can't
+    # invalidate the others' copies, so nothing is cached for longer than
+    # LOCAL_ONLY_CACHE_TIMEOUT seconds
+    SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+    SHARED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    LOCAL_ONLY_CACHE_TIMEOUT = 1
     CSRF_ENABLED = True
     FLASK_APP = "flashlearn"
     sqlite_db_path = os.path.join(BASE_DIR, "dev_db.sqlite3")
@@ -28,12 +54,45 @@ class BaseConfig:
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     LOG_FILE = os.getenv("LOG_FILE") or os.path.join(ROOT_DIR, "flashlearn.log")
     LOG_LEVEL = 20
+    # Number of upcoming cards sent along with the active card in study
+    # responses, so the client can flip to the next card without waiting
+    STUDY_PREFETCH = 5
+    STUDY_PREFETCH_MAX = 50
+    # Cards per /cards/page response
+    CARDS_PAGE_SIZE = 50
+    CARDS_PAGE_SIZE_MAX = 200
+    # Uploaded CSV/TSV files wait here for `flask import-worker`
+    IMPORT_FOLDER = os.getenv("IMPORT_FOLDER") or os.path.join(BASE_DIR, "imports")
+    IMPORT_WORKER_POLL_INTERVAL = 2
+    # Seconds the authenticated user's snapshot stays cached, see UserSnapshot.
+    # Only with a shared cache, which every worker invalidates, per process
+    # caches keep it LOCAL_ONLY_CACHE_TIMEOUT seconds at most
+    USER_SNAPSHOT_TIMEOUT = 300
+    # bcrypt cost factor, password hashes made with another cost are
+    # rehashed when their user logs in
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    # Password hashes are computed by this many threads per process, other
+    # requests keep being served while logins wait for them
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_TIMEOUT = 30
+    # Count and time the SQL statements of each request, logging requests
+    # over either threshold with their slowest statements
+    SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "false").lower() in (
+        "1",
+        "true",
+    )
+    # Add X-Query-Count and Server-Timing headers to instrumented responses
+    SQL_INSTRUMENTATION_HEADERS = False
+    SLOW_REQUEST_THRESHOLD = 0.5
+    SLOW_REQUEST_QUERY_COUNT = 50
 
 
 class DevelopmentConfig(BaseConfig):
     """Development config class"""
 
     DEBUG = True
+    SQL_INSTRUMENTATION = True
+    SQL_INSTRUMENTATION_HEADERS = True
 
 
 class TestingConfig(BaseConfig):
@@ -42,6 +101,8 @@ class TestingConfig(BaseConfig):
     DEBUG = True
     TESTING = True
     WTF_CSRF_ENABLED = False
+    # The minimum cost, hashing is not what the tests are about
+    BCRYPT_LOG_ROUNDS = 4
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     # Fix to use in-memory db for tests.
     # Replace with above db path to save test data in-file.
@@ -0,0 +1,25 @@
+"""normalize card states
+
+Revision ID: 0c5e8a2d7f14
+Revises: e9f25b7a3d61
+Create Date: 2026-10-18 17:02:51.730418
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0c5e8a2d7f14"
+down_revision = "e9f25b7a3d61"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Decks used to be reset to lowercase states
+    op.execute("UPDATE cards SET state = 'Active' WHERE state = 'active'")
+    op.execute("UPDATE cards SET state = 'Solved' WHERE state = 'solved'")
+
+
+def downgrade():
+    pass
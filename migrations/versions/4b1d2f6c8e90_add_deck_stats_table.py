@@ -0,0 +1,87 @@
+"""add deck stats table
+
+Revision ID: 4b1d2f6c8e90
+Revises: dc28c32e37fe
+Create Date: 2026-10-18 09:12:40.118202
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "4b1d2f6c8e90"
+down_revision = "dc28c32e37fe"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "deck_stats",
+        sa.Column("deck_id", sa.Integer(), nullable=False),
+        sa.Column("card_count", sa.Integer(), nullable=False),
+        sa.Column("active_count", sa.Integer(), nullable=False),
+        sa.Column("solved_count", sa.Integer(), nullable=False),
+        sa.Column("disabled_count", sa.Integer(), nullable=False),
+        sa.Column("child_count", sa.Integer(), nullable=False),
+        sa.Column("last_session_id", sa.Integer(), nullable=True),
+        sa.Column("known", sa.Integer(), nullable=True),
+        sa.Column("unknown", sa.Integer(), nullable=True),
+        sa.Column("last_studied", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["deck_id"],
+            ["decks.id"],
+        ),
+        sa.PrimaryKeyConstraint("deck_id"),
+    )
+    # Backfill the stats of existing decks, like `flask rebuild-deck-stats`
+    op.execute(
+        """
+        INSERT INTO deck_stats (
+            deck_id, card_count, active_count, solved_count, disabled_count,
+            child_count, last_session_id, known, unknown, last_studied
+        )
+        SELECT
+            decks.id,
+            COALESCE(cards.card_count, 0),
+            COALESCE(cards.active_count, 0),
+            COALESCE(cards.solved_count, 0),
+            COALESCE(cards.disabled_count, 0),
+            COALESCE(children.child_count, 0),
+            study_sessions.id,
+            study_sessions.known,
+            study_sessions.unknown,
+            study_sessions.date_updated
+        FROM decks
+        LEFT JOIN (
+            SELECT
+                deck_id,
+                COUNT(id) AS card_count,
+                SUM(CASE WHEN LOWER(COALESCE(state, 'active')) = 'active'
+                    THEN 1 ELSE 0 END) AS active_count,
+                SUM(CASE WHEN LOWER(state) = 'solved'
+                    THEN 1 ELSE 0 END) AS solved_count,
+                SUM(CASE WHEN LOWER(state) = 'disabled'
+                    THEN 1 ELSE 0 END) AS disabled_count
+            FROM cards
+            GROUP BY deck_id
+        ) AS cards ON cards.deck_id = decks.id
+        LEFT JOIN (
+            SELECT parent_id, COUNT(id) AS child_count
+            FROM decks
+            GROUP BY parent_id
+        ) AS children ON children.parent_id = decks.id
+        LEFT JOIN study_sessions ON study_sessions.id = (
+            SELECT latest.id
+            FROM study_sessions AS latest
+            WHERE latest.deck_id = decks.id AND latest.user_id = decks.user_id
+            ORDER BY latest.date_updated DESC, latest.id DESC
+            LIMIT 1
+        )
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("deck_stats")
@@ -0,0 +1,43 @@
+"""add study queue table
+
+Revision ID: 9e3a7c51d2b4
+Revises: 4b1d2f6c8e90
+Create Date: 2026-10-18 10:03:12.584310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9e3a7c51d2b4"
+down_revision = "4b1d2f6c8e90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "study_queue",
+        sa.Column("study_session_id", sa.Integer(), nullable=False),
+        sa.Column("position", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("card_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["card_id"], ["cards.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["study_session_id"],
+            ["study_sessions.id"],
+        ),
+        sa.PrimaryKeyConstraint("study_session_id", "position"),
+    )
+    op.create_index(
+        "ix_study_queue_study_session_id_card_id",
+        "study_queue",
+        ["study_session_id", "card_id"],
+        unique=False,
+    )
+    # In progress sessions build their queue the next time a card is requested
+
+
+def downgrade():
+    op.drop_index("ix_study_queue_study_session_id_card_id", table_name="study_queue")
+    op.drop_table("study_queue")
@@ -0,0 +1,58 @@
+"""add import jobs table
+
+Revision ID: a3c6e9b12f58
+Revises: f1a96c0d4e27
+Create Date: 2026-10-18 13:14:41.208337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a3c6e9b12f58"
+down_revision = "f1a96c0d4e27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "import_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "date_created",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=True,
+        ),
+        sa.Column(
+            "date_updated",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=True,
+        ),
+        sa.Column("state", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("deck_id", sa.Integer(), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("delimiter", sa.String(length=1), nullable=False),
+        sa.Column("front_column", sa.String(length=100), nullable=False),
+        sa.Column("back_column", sa.String(length=100), nullable=False),
+        sa.Column("deck_column", sa.String(length=100), nullable=True),
+        sa.Column("has_header", sa.Boolean(), nullable=True),
+        sa.Column("imported", sa.Integer(), nullable=True),
+        sa.Column("failed", sa.Integer(), nullable=True),
+        sa.Column("errors", sa.Text(), nullable=True),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["deck_id"], ["decks.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # The worker polls for the oldest pending job
+    op.create_index("ix_import_jobs_state_id", "import_jobs", ["state", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_import_jobs_state_id", table_name="import_jobs")
+    op.drop_table("import_jobs")
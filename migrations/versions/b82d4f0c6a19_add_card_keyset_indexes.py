@@ -0,0 +1,36 @@
+"""add card keyset pagination indexes
+
+Revision ID: b82d4f0c6a19
+Revises: a3c6e9b12f58
+Create Date: 2026-10-18 14:02:55.671204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b82d4f0c6a19"
+down_revision = "a3c6e9b12f58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Card listings page on (date_created, id), by user or by deck
+    op.create_index(
+        "ix_cards_user_id_date_created_id",
+        "cards",
+        ["user_id", "date_created", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_cards_deck_id_date_created_id",
+        "cards",
+        ["deck_id", "date_created", "id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_cards_deck_id_date_created_id", table_name="cards")
+    op.drop_index("ix_cards_user_id_date_created_id", table_name="cards")
@@ -0,0 +1,56 @@
+"""add composite indexes for the hot query paths
+
+Revision ID: c7f04e2a9b13
+Revises: 9e3a7c51d2b4
+Create Date: 2026-10-18 10:41:55.902117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "c7f04e2a9b13"
+down_revision = "9e3a7c51d2b4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # users.username is already indexed by its unique constraint
+    op.create_index(
+        "ix_cards_user_id_deck_id_state_date_created",
+        "cards",
+        ["user_id", "deck_id", "state", "date_created"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_study_session_logs_study_session_id_card_id",
+        "study_session_logs",
+        ["study_session_id", "card_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_study_sessions_user_id_deck_id_state_date_updated",
+        "study_sessions",
+        ["user_id", "deck_id", "state", "date_updated"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_study_plans_user_id_state_date_created",
+        "study_plans",
+        ["user_id", "state", "date_created"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_study_plans_user_id_state_date_created", table_name="study_plans")
+    op.drop_index(
+        "ix_study_sessions_user_id_deck_id_state_date_updated",
+        table_name="study_sessions",
+    )
+    op.drop_index(
+        "ix_study_session_logs_study_session_id_card_id",
+        table_name="study_session_logs",
+    )
+    op.drop_index("ix_cards_user_id_deck_id_state_date_created", table_name="cards")
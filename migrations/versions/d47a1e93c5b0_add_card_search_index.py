@@ -0,0 +1,60 @@
+"""add card full-text search index
+
+Revision ID: d47a1e93c5b0
+Revises: b82d4f0c6a19
+Create Date: 2026-10-18 14:48:03.115926
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "d47a1e93c5b0"
+down_revision = "b82d4f0c6a19"
+branch_labels = None
+depends_on = None
+
+# Copied from flashlearn.search at the time of this revision
+PG_DOCUMENT = "to_tsvector('english', cards.front || ' ' || cards.back)"
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(front, back, user_id,"
+    " content='cards', content_rowid='id', tokenize='porter unicode61',"
+    " prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_ai AFTER INSERT ON cards BEGIN"
+    " INSERT INTO cards_fts(rowid, front, back, user_id)"
+    " VALUES (new.id, new.front, new.back, new.user_id);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_ad AFTER DELETE ON cards BEGIN"
+    " INSERT INTO cards_fts(cards_fts, rowid, front, back, user_id)"
+    " VALUES ('delete', old.id, old.front, old.back, old.user_id);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_au AFTER UPDATE OF front, back ON cards"
+    " BEGIN"
+    " INSERT INTO cards_fts(cards_fts, rowid, front, back, user_id)"
+    " VALUES ('delete', old.id, old.front, old.back, old.user_id);"
+    " INSERT INTO cards_fts(rowid, front, back, user_id)"
+    " VALUES (new.id, new.front, new.back, new.user_id);"
+    " END",
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        # Note: batch_alter_table("cards") recreates the table on SQLite,
+        # which drops these triggers, later migrations must recreate them
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+        # Index the existing cards
+        op.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+    else:
+        op.execute(f"CREATE INDEX ix_cards_search ON cards USING gin ({PG_DOCUMENT})")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS cards_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS cards_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS cards_fts_ai")
+        op.execute("DROP TABLE IF EXISTS cards_fts")
+    else:
+        op.drop_index("ix_cards_search", table_name="cards")
@@ -0,0 +1,25 @@
+"""add study session shuffle seed
+
+Revision ID: e5b8d3f17a62
+Revises: c7f04e2a9b13
+Create Date: 2026-10-18 11:20:37.446091
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e5b8d3f17a62"
+down_revision = "c7f04e2a9b13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("study_sessions", sa.Column("seed", sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("study_sessions", schema=None) as batch_op:
+        batch_op.drop_column("seed")
@@ -0,0 +1,33 @@
+"""add study session include subdecks
+
+Revision ID: e9f25b7a3d61
+Revises: d47a1e93c5b0
+Create Date: 2026-10-18 15:36:20.452187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e9f25b7a3d61"
+down_revision = "d47a1e93c5b0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("study_sessions", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "include_subdecks",
+                sa.Boolean(),
+                server_default=sa.false(),
+                nullable=False,
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("study_sessions", schema=None) as batch_op:
+        batch_op.drop_column("include_subdecks")
@@ -0,0 +1,79 @@
+"""add spaced repetition schedule
+
+Revision ID: f1a96c0d4e27
+Revises: e5b8d3f17a62
+Create Date: 2026-10-18 12:02:18.730551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f1a96c0d4e27"
+down_revision = "e5b8d3f17a62"
+branch_labels = None
+depends_on = None
+
+study_type_enum = sa.Enum(
+    "one_off", "recurrent", "spaced_repetition", name="studytypeenum"
+)
+
+
+def upgrade():
+    with op.batch_alter_table("cards", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("repetitions", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("interval_days", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("ease_factor", sa.Float(), nullable=True))
+        batch_op.add_column(
+            sa.Column("next_review_at", sa.DateTime(timezone=True), nullable=True)
+        )
+        batch_op.create_index(
+            "ix_cards_user_id_state_next_review_at",
+            ["user_id", "state", "next_review_at"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_cards_deck_id_state_next_review_at",
+            ["deck_id", "state", "next_review_at"],
+            unique=False,
+        )
+    # Existing cards have never been reviewed, make them due right away
+    op.execute(
+        "UPDATE cards SET repetitions = 0, interval_days = 0, ease_factor = 2.5,"
+        " next_review_at = date_created"
+    )
+    # SQLite can't add a column with a CURRENT_TIMESTAMP default to a table
+    # with rows, batch mode recreates the table there to set it afterwards
+    # and issues a plain ALTER on Postgres
+    with op.batch_alter_table("cards", schema=None) as batch_op:
+        batch_op.alter_column(
+            "next_review_at",
+            existing_type=sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+        )
+
+    study_type_enum.create(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table("study_plans", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "study_type",
+                study_type_enum,
+                server_default="one_off",
+                nullable=False,
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("study_plans", schema=None) as batch_op:
+        batch_op.drop_column("study_type")
+    study_type_enum.drop(op.get_bind(), checkfirst=True)
+
+    with op.batch_alter_table("cards", schema=None) as batch_op:
+        batch_op.drop_index("ix_cards_deck_id_state_next_review_at")
+        batch_op.drop_index("ix_cards_user_id_state_next_review_at")
+        batch_op.drop_column("next_review_at")
+        batch_op.drop_column("ease_factor")
+        batch_op.drop_column("interval_days")
+        batch_op.drop_column("repetitions")
@@ -1,4 +1,9 @@
-from flashlearn.models import User
+import time
+from flask_bcrypt import Bcrypt
+from sqlalchemy import event
+from flashlearn import cache_backends, db
+from flashlearn.models import Deck, User, UserSnapshot
+from instance.config import BaseConfig
 
 
 class TestAuth:
@@ -68,3 +73,45 @@ class TestAuth:
         res = client.get("/cards")
         assert res.status_code == 302, "Should redirect to login page"
         # self.assertIn(b'fmdk', res.data)
+
+    def test_user_snapshot(self, user, login, client):
+        login()
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            assert client.get("/cards/page").status_code == 200
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        assert statements, "Should still query the cards"
+        assert not [s for s in statements if "FROM users" in s], "Should be cached"
+
+        user.update(username="alice2")
+        assert UserSnapshot.load(user.id).username == "alice2", "Should invalidate"
+        res = client.post("/user/account/username", data={"username": "alice3"})
+        assert res.status_code == 200
+        assert User.query.get(user.id).username == "alice3"
+        assert UserSnapshot.load(user.id).username == "alice3"
+        assert (
+            Deck.query.filter_by(user_id=user.id).count() == 1
+        ), "Should not create another default deck when saving a user"
+
+    def test_user_snapshot_other_worker(self, super_user, login, client, monkeypatch):
+        login(username="bob", password="password")
+        assert client.get("/cache/stats").status_code == 200
+        # Demoted by another worker, whose invalidation doesn't reach this one
+        User.query.filter_by(id=super_user.id).update({"is_superuser": False})
+        db.session.commit()
+        later = time.time() + BaseConfig.LOCAL_ONLY_CACHE_TIMEOUT + 1
+        monkeypatch.setattr(cache_backends.time, "time", lambda: later)
+        assert client.get("/cache/stats").status_code == 401, "Should expire"
+
+    def test_login_rehash(self, user, login):
+        user.update(password=Bcrypt().generate_password_hash("password", 5).decode())
+        login()
+        password_hash = User.query.get(user.id).password
+        assert password_hash.startswith("$2b$04$"), "Should rehash with the new cost"
+        assert login().status_code == 200, "Should still log in"
@@ -0,0 +1,155 @@
+import threading
+import time
+from flask import jsonify
+from flashlearn import db, redis_cache
+from flashlearn.cache import (
+    deck_key,
+    fetch,
+    generation_key,
+    invalidate_decks,
+    invalidate_user,
+    user_key,
+)
+
+
+class TestCache:
+    def test_user_key(self, test_app):
+        key = user_key(1, "decks")
+        assert key == user_key(1, "decks"), "Should be stable"
+        assert key != user_key(2, "decks"), "Should be per user"
+        invalidate_user(1)
+        assert key != user_key(1, "decks"), "Should change with the generation"
+
+    def test_deck_key(self, test_app):
+        key = deck_key(1, 10, "view")
+        invalidate_decks(11)
+        assert key == deck_key(1, 10, "view"), "Should not change for other decks"
+        invalidate_decks(10)
+        assert key != deck_key(1, 10, "view"), "Should change with the deck"
+        key = deck_key(1, 10, "view")
+        invalidate_user(1)
+        assert key != deck_key(1, 10, "view"), "Should change with the user"
+
+    def test_lost_generation(self, test_app):
+        key = user_key(1, "decks")
+        invalidate_user(1)
+        redis_cache.delete(generation_key("user", 1))
+        assert key != user_key(1, "decks"), "Should not restart an old generation"
+
+    def test_fetch_single_flight(self, test_app, client):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return jsonify(len(calls))
+
+        def request():
+            with test_app.app_context():
+                results.append(fetch("view", compute).get_json())
+
+        results = []
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert 1 == len(calls), "Should compute concurrent misses once"
+        assert [1, 1, 1] == results
+        assert not redis_cache.has("lock:view"), "Should release the lock"
+
+    def test_fetch_stale(self, client):
+        fetch("view:1", lambda: jsonify("old"), stale_key="view", stale_ttl=30)
+        # Another request is computing the next generation
+        redis_cache.add("lock:view:2", 1)
+        res = fetch("view:2", lambda: jsonify("new"), stale_key="view", stale_ttl=30)
+        assert "old" == res.get_json(), "Should serve the stale response"
+        redis_cache.delete("lock:view:2")
+        res = fetch("view:2", lambda: jsonify("new"), stale_key="view", stale_ttl=30)
+        assert "new" == res.get_json()
+
+    def test_fetch_timeout(self, client, monkeypatch):
+        monkeypatch.setattr("flashlearn.cache.LOCK_TIMEOUT", 0.1)
+        # The request holding the lock died
+        redis_cache.add("lock:view", 1)
+        assert "new" == fetch("view", lambda: jsonify("new")).get_json()
+
+
+class TestCachedViews:
+    def test_edit_card_moves_deck(self, client, login, decks, card):
+        login()
+        res = client.get(f"/deck/{decks[1].id}")
+        assert card.front in res.get_data(as_text=True)
+        res = client.post(f"/card/{card.id}/edit", data={"deck_id": decks[0].id})
+        assert 200 == res.status_code
+        # The tests share one session, unlike requests
+        db.session.expire_all()
+        res = client.get(f"/deck/{decks[1].id}")
+        assert card.front not in res.get_data(as_text=True), "Should not be stale"
+        res = client.get(f"/deck/{decks[0].id}")
+        assert card.front in res.get_data(as_text=True)
+
+    def test_delete_deck(self, client, login, decks):
+        login()
+        res = client.get(f"/deck/{decks[0].id}")
+        assert "Study with sub decks" in res.get_data(as_text=True)
+        client.post(f"/deck/{decks[1].id}/delete")
+        res = client.get(f"/deck/{decks[0].id}")
+        assert "Study with sub decks" not in res.get_data(
+            as_text=True
+        ), "Should not be stale"
+
+    def test_etag(self, client, login, card):
+        login()
+        res = client.get(f"/card/{card.id}")
+        etag = res.headers["ETag"]
+        assert 200 == res.status_code and not etag.startswith("W/"), "Should be strong"
+        res = client.get(f"/card/{card.id}", headers={"If-None-Match": etag})
+        assert 304 == res.status_code, "Should not be modified"
+        assert not res.get_data()
+        client.post(f"/card/{card.id}/edit", data={"front": "What is DP"})
+        res = client.get(f"/card/{card.id}", headers={"If-None-Match": etag})
+        assert 200 == res.status_code and res.headers["ETag"] != etag
+
+    def test_cache_response(self, client, login, decks):
+        login()
+        res = client.post(f"/deck/{decks[0].id}")
+        assert res.get_json()["name"] == decks[0].name
+        cached = client.post(f"/deck/{decks[0].id}")
+        assert cached.get_json() == res.get_json(), "Should return the cached body"
+        assert "ETag" not in cached.headers, "POSTs can't be revalidated"
+        assert cached.mimetype == "application/json"
+        res = client.get(f"/deck/{decks[0].id}/json")
+        assert res.get_json() == cached.get_json()
+        etag = res.headers["ETag"]
+        res = client.get(f"/deck/{decks[0].id}/json", headers={"If-None-Match": etag})
+        assert 304 == res.status_code, "Should revalidate the cached response"
+        res = client.get(f"/deck/{decks[0].id}")
+        assert res.mimetype == "text/html", "Should not collide with POST"
+        etag = res.headers["ETag"]
+        res = client.get(f"/deck/{decks[0].id}", headers={"If-None-Match": etag})
+        assert 304 == res.status_code
+
+    def test_cache_response_plan(self, client, login, plan):
+        login()
+        res = client.get(f"/plan/{plan.id}")
+        assert res.get_json()["order"] == "oldest"
+        res = client.post(
+            f"/plan/{plan.id}/edit", data={"order": "random", "study_type": "one_off"}
+        )
+        assert 200 == res.status_code
+        assert client.get(f"/plan/{plan.id}").get_json()["order"] == "random"
+        res = client.get("/plans/json")
+        assert "random" in [p["order"] for p in res.get_json()]
+        res = client.get("/plans/json", headers={"If-None-Match": res.headers["ETag"]})
+        assert 304 == res.status_code
+        res = client.get("/decks/json")
+        assert res.get_json() and res.headers["ETag"]
+
+    def test_cache_stats(self, client, login, user, super_user):
+        login()
+        assert 401 == client.get("/cache/stats").status_code
+        login("bob", "password")
+        tiers = client.get("/cache/stats").get_json()
+        assert tiers.pop("pid")
+        assert tiers and all("hits" in tier for tier in tiers.values())
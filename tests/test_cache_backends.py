@@ -0,0 +1,261 @@
+import pytest
+from multiprocessing import Process
+from flask_caching.backends import SimpleCache
+from flashlearn import cache_backends
+from flashlearn.cache_backends import (
+    UNAVAILABLE,
+    CircuitBreaker,
+    LRUCache,
+    SQLiteCache,
+    TieredCache,
+    from_config,
+)
+from instance.config import BaseConfig
+
+
+class FakeRedis:
+    """Records published messages, as a Redis client and its pipelines"""
+
+    def __init__(self):
+        self.messages = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def publish(self, channel, message):
+        self.messages.append(message)
+
+    def execute(self):
+        pass
+
+
+class TestLRUCache:
+    def test_eviction(self):
+        cache = LRUCache(max_bytes=150)
+        cache.set("a", "x" * 50)
+        cache.set("b", "x" * 50)
+        assert cache.get("a"), "Should be cached"
+        cache.set("c", "x" * 50)
+        assert cache.get("b") is None, "Should evict the least recently used"
+        assert cache.get("a") and cache.get("c")
+        assert cache.set("d", "x" * 300) is False, "Should not store values too big"
+        assert cache.size <= 150
+
+    def test_timeout(self, monkeypatch):
+        now = 1000.0
+        monkeypatch.setattr(cache_backends.time, "time", lambda: now)
+        cache = LRUCache(default_timeout=30)
+        cache.set("a", 1)
+        cache.set("b", 1, timeout=0)
+        now += 31
+        assert cache.get("a") is None, "Should expire"
+        assert cache.get("b") == 1, "Should never expire"
+
+    def test_values(self):
+        cache = LRUCache()
+        value = {"cards": [1]}
+        cache.set("a", value)
+        value["cards"].append(2)
+        assert cache.get("a") == {"cards": [1]}, "Should not share values"
+        assert cache.add("a", {}) is False
+        assert cache.inc("n") == 1 and cache.inc("n", 2) == 3
+        assert cache.stats()["hits"] == 1
+
+
+class TestTieredCache:
+    def test_tiers(self):
+        remote = SimpleCache()
+        cache = TieredCache(LRUCache(), remote)
+        remote.set("a", 1)
+        assert cache.get("a") == 1, "Should read through to the remote tier"
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        stats = cache.stats()
+        assert stats["local"]["hits"] == 1
+        assert stats["remote"] == {"hits": 1, "misses": 1, "state": "closed"}
+        cache.set("c", 2)
+        assert remote.get("c") == 2, "Should write to both tiers"
+
+    def test_inc(self):
+        cache = TieredCache(LRUCache(), SimpleCache())
+        cache.add("gen", 10, timeout=0)
+        assert cache.get("gen") == 10
+        cache.inc("gen")
+        assert cache.get("gen") == 11, "Should drop the local copy"
+
+    def test_invalidation(self):
+        client = FakeRedis()
+        local, remote = LRUCache(), SimpleCache()
+        cache = TieredCache(local, remote, client=client)
+        # The subscriber thread is not needed to check messages
+        cache.listen = lambda: None
+        cache._sender = "worker-1"
+        cache.set("a", 1)
+        cache.delete_many("b", "c")
+        assert client.messages == ["worker-1 a", "worker-1 b", "worker-1 c"]
+
+        cache.invalidate("worker-1 a")
+        assert local.get("a") == 1, "Should ignore its own messages"
+        cache.invalidate("worker-2 a")
+        assert local.get("a") is None, "Should drop the local copy"
+        cache.set("a", 1)
+        cache.invalidate("worker-2 *")
+        assert not local.stats()["entries"], "Should clear the local tier"
+
+    def test_unavailable(self):
+        remote = FailingCache()
+        breaker = CircuitBreaker(max_failures=2, errors=(ConnectionError,))
+        cache = TieredCache(LRUCache(), remote, breaker=breaker)
+        assert cache.get("a") is None, "Should miss instead of raising"
+        cache.set("a", 1)
+        assert cache.get("a") == 1, "Should cache locally"
+        assert breaker.state == "open"
+        cache.add("gen", 10, timeout=0)
+        assert cache.inc("gen") == 11, "Should increment locally"
+        assert 2 == remote.calls, "Should not call an open circuit"
+
+        remote.up = True
+        breaker.opened_at = None
+        assert cache.get("b") is None
+        assert {"a", "gen"} == remote.deleted, "Should delete keys written meanwhile"
+
+
+class FailingCache(SimpleCache):
+    """A remote tier which is down until `up`"""
+
+    def __init__(self):
+        super().__init__()
+        self.up = False
+        self.calls = 0
+        self.deleted = set()
+
+    def get_many(self, *keys):
+        self.calls += 1
+        if not self.up:
+            raise ConnectionError()
+        return super().get_many(*keys)
+
+    set = add = inc = get_many
+
+    def delete_many(self, *keys):
+        self.deleted.update(keys)
+        return super().delete_many(*keys)
+
+
+class TestCircuitBreaker:
+    def test_states(self, monkeypatch):
+        now = 1000.0
+        monkeypatch.setattr(cache_backends.time, "monotonic", lambda: now)
+        breaker = CircuitBreaker(max_failures=2, reset_timeout=30)
+
+        def fail():
+            raise ConnectionError()
+
+        assert breaker.call(fail) is UNAVAILABLE
+        assert breaker.state == "closed", "Should tolerate a few failures"
+        assert breaker.call(fail) is UNAVAILABLE
+        assert breaker.state == "open"
+        assert breaker.call(lambda: 1) is UNAVAILABLE, "Should fail fast"
+        now += 30
+        assert breaker.state == "half-open"
+        assert breaker.call(fail) is UNAVAILABLE
+        assert breaker.state == "open", "Should reopen after a failed trial"
+        now += 30
+        assert breaker.call(lambda: 1) == 1
+        assert breaker.state == "closed", "Should close after a successful trial"
+
+    def test_errors(self):
+        breaker = CircuitBreaker(errors=(ConnectionError,))
+
+        def fail():
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            breaker.call(fail)
+        assert breaker.failures == 0, "Should only count backend errors"
+
+
+class TestFromConfig:
+    def test_redis(self, monkeypatch):
+        monkeypatch.setattr(BaseConfig, "USE_REDIS_CACHE", True)
+        monkeypatch.setattr(BaseConfig, "REDIS_URL", "redis://cache.local:6380/2")
+        cache = from_config(BaseConfig)
+        pool = cache.client.connection_pool
+        assert pool.max_connections == BaseConfig.REDIS_MAX_CONNECTIONS
+        options = pool.connection_kwargs
+        assert options["host"] == "cache.local" and options["db"] == 2
+        assert options["socket_timeout"] == BaseConfig.REDIS_SOCKET_TIMEOUT
+        assert cache.remote.key_prefix == BaseConfig.CACHE_KEY_PREFIX
+
+    def test_local(self, tmp_path, monkeypatch):
+        now = 1000.0
+        monkeypatch.setattr(cache_backends.time, "time", lambda: now)
+        cache = from_config(BaseConfig)
+        assert isinstance(cache, TieredCache)
+        cache.set("a", 1, timeout=300)
+        cache.set("b", 1, timeout=0)
+        now += BaseConfig.LOCAL_ONLY_CACHE_TIMEOUT + 1
+        assert cache.get("a") is None, "Other workers' copies can't be invalidated"
+        assert cache.get("b") == 1, "Should never expire"
+        monkeypatch.setattr(BaseConfig, "SHARED_CACHE_PATH", str(tmp_path / "cache"))
+        assert isinstance(from_config(BaseConfig), SQLiteCache)
+
+
+def increment(path, times):
+    cache = SQLiteCache(path)
+    for _ in range(times):
+        cache.inc("counter")
+
+
+class TestSQLiteCache:
+    def test_values(self, tmp_path):
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+        cache.set("a", {"cards": [1]})
+        assert cache.get("a") == {"cards": [1]}
+        assert cache.get_many("a", "b") == [{"cards": [1]}, None]
+        assert cache.add("a", 2) is False, "Should keep live entries"
+        assert cache.add("b", 2) and cache.get("b") == 2
+        assert cache.inc("n") == 1 and cache.inc("n", 2) == 3
+        assert cache.delete("a") and cache.get("a") is None
+        cache.delete_many("b", "n")
+        assert cache.stats()["shared"]["entries"] == 0
+
+    def test_timeout(self, tmp_path, monkeypatch):
+        now = 1000.0
+        monkeypatch.setattr(cache_backends.time, "time", lambda: now)
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), default_timeout=30)
+        cache.set("a", 1)
+        cache.set("b", 1, timeout=0)
+        now += 31
+        assert cache.get("a") is None, "Should expire"
+        assert cache.get("b") == 1, "Should never expire"
+        assert cache.add("a", 2), "Should replace expired entries"
+        cache.evict()
+        assert cache.stats()["shared"]["entries"] == 2
+
+    def test_evict(self, tmp_path, monkeypatch):
+        now = 1000.0
+        monkeypatch.setattr(cache_backends.time, "time", lambda: now)
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_bytes=150)
+        for key in "abc":
+            now += 10
+            cache.set(key, "x" * 50)
+        now += 10
+        assert cache.get("a"), "Should refresh the access time"
+        cache.evict()
+        assert cache.get("b") is None, "Should evict the least recently used"
+        assert cache.get("a") and cache.get("c")
+
+    def test_shared(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        cache = SQLiteCache(path)
+        cache.set("a", 1)
+        workers = [Process(target=increment, args=(path, 50)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert cache.get("counter") == 200, "Should increment atomically"
+        assert SQLiteCache(path).get("a") == 1, "Should share entries"
+        cache.delete("a")
+        assert SQLiteCache(path).get("a") is None, "Should share deletes"
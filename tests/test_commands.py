@@ -1,3 +1,6 @@
+from flashlearn.models import ImportJob
+
+
 class TestCommands:
     """Commands test class"""
 
@@ -25,3 +28,20 @@ class TestCommands:
             assert (
                 "User created successfully" in res.output
             ), "Should successfully create the user"
+
+    def test_rebuild_deck_stats(self, test_app, decks):
+        cli_runner = test_app.test_cli_runner()
+        res = cli_runner.invoke(args=["rebuild-deck-stats"])
+        assert "Rebuilt stats for 3 decks" in res.output, "Should rebuild deck stats"
+
+    def test_import_worker(self, test_app, user, decks, tmp_path):
+        path = tmp_path / "cards.csv"
+        path.write_text("F1,B1\nF2,B2\n")
+        job = ImportJob(
+            user_id=user.id, deck_id=decks[0].id, file_path=str(path), state="Pending"
+        )
+        job.save()
+        cli_runner = test_app.test_cli_runner()
+        res = cli_runner.invoke(args=["import-worker", "--once"])
+        assert f"Import job {job.id}: Complete, 2 cards" in res.output
+        assert ImportJob.query.get(job.id).state == "Complete"
@@ -1,5 +1,26 @@
+import gzip
+import io
 import json
-from flashlearn.models import Card, Deck, StudyPlan
+from contextlib import contextmanager
+from flashlearn import db, models
+from flashlearn.models import (
+    Card,
+    Deck,
+    DeckStats,
+    ImportJob,
+    StudyPlan,
+    StudySession,
+)
+
+
+@contextmanager
+def foreign_keys():
+    """Enforce foreign keys like Postgres, outside a transaction to take effect"""
+    db.session.execute("PRAGMA foreign_keys=ON")
+    try:
+        yield
+    finally:
+        db.session.execute("PRAGMA foreign_keys=OFF")
 
 
 class TestRoutes:
@@ -37,6 +58,58 @@ class TestRoutes:
             Card.query.filter_by(deck_id=decks[0].id).count() == 2
         ), "The deck should now have two cards"
 
+    def test_import_deck_cards(self, decks, login, client):
+        login()
+        lines = [json.dumps({"front": f"F{i}", "back": "B"}) for i in range(3)]
+        res = client.post(
+            f"/deck/{decks[0].id}/import",
+            data="\n".join(lines + ["not json"]),
+            content_type="application/x-ndjson",
+        )
+        assert 200 == res.status_code
+        progress = json.loads(res.get_data(as_text=True).splitlines()[-1])
+        assert progress["imported"] == 3 and progress["failed"] == 1
+        assert Card.query.filter_by(deck_id=decks[0].id).count() == 3
+        for malformed in ('[{"front": "F", "back": "B"} 2]', "[1,,2]"):
+            res = client.post(f"/deck/{decks[0].id}/import", data=malformed)
+            assert 400 == res.status_code, "Should reject malformed arrays"
+        assert Card.query.filter_by(deck_id=decks[0].id).count() == 3
+
+    def test_import_deck_file(self, test_app, decks, login, client, tmp_path):
+        login()
+        test_app.config["IMPORT_FOLDER"] = str(tmp_path)
+        res = client.post(
+            f"/deck/{decks[0].id}/import/file",
+            data={
+                "file": (io.BytesIO(b"front,back\nF,B\n"), "cards.csv"),
+                "has_header": "true",
+                "front_column": "front",
+                "back_column": "back",
+            },
+        )
+        assert 202 == res.status_code, "Should queue the import job"
+        job = res.get_json()["job"]
+        assert job["state"] == "Pending"
+        assert len(list(tmp_path.iterdir())) == 1, "Should save the uploaded file"
+
+        res = client.get(f"/import/{job['id']}")
+        assert 200 == res.status_code and res.get_json()["imported"] == 0
+        assert 404 == client.get(f"/import/{job['id'] + 1}").status_code
+
+    def test_export_deck(self, user, decks, card, login, client):
+        login()
+        res = client.get(f"/deck/{decks[0].id}/export?format=csv")
+        assert 200 == res.status_code and res.mimetype == "text/csv"
+        assert "deck-" in res.headers["Content-Disposition"]
+        assert card.front in res.get_data(as_text=True), "Should export sub decks"
+
+        res = client.get(f"/deck/{decks[0].id}/export?recursive=false")
+        assert res.get_data() == b"", "Should only export the deck itself"
+        res = client.get("/export?gzip=true")
+        assert res.mimetype == "application/gzip"
+        assert json.loads(gzip.decompress(res.get_data()))["id"] == card.id
+        assert 400 == client.get("/export?format=xml").status_code
+
     def test_get_card(self, client, card, login):
         login()
         res = client.get(f"/card/{card.id}")
@@ -52,6 +125,18 @@ class TestRoutes:
         assert "Disabled" == solved_card.state
         assert "New Front" == solved_card.front
 
+    def test_edit_card_foreign_deck(self, card, super_user, login, client):
+        login()
+        deck = Deck(name="Bob's Deck", user_id=super_user.id)
+        deck.save()
+        deck_id, card_deck_id = deck.id, card.deck_id
+        res = client.post(f"/card/{card.id}/edit", data={"deck_id": deck_id})
+        assert 404 == res.status_code, "Should not move cards to other users' decks"
+        res = client.post(f"/card/{card.id}/edit", data={"deck_id": "spam"})
+        assert 400 == res.status_code
+        assert Card.query.get(card.id).deck_id == card_deck_id
+        assert DeckStats.query.get(deck_id).card_count == 0
+
     def test_delete_card(self, card, login, client):
         login()
         res = client.post(f"/card/{card.id}/delete")
@@ -69,17 +154,71 @@ class TestRoutes:
         card_2.save()
         res = client.post(
             "/card/bulk/delete",
-            data={"data": json.dumps([card.id, card_2.id])},
+            data={"data": json.dumps([card.id, card_2.id, 9999])},
         )
         assert 200 == res.status_code, "Should return a 200 status code"
+        assert res.get_json()["deleted"] == 2, "Should delete the owned cards"
+        assert res.get_json()["rejected"] == 1, "Should reject the missing card"
         assert Card.query.filter_by(id=card.id).first() is None
         assert Card.query.filter_by(id=card_2.id).first() is None
+        assert DeckStats.query.get(card.deck_id).card_count == 0
 
     def test_get_cards(self, card, login, client):
         login()
         res = client.get("/cards")
         assert 200 == res.status_code
-        assert "Dynamic Programming" in res.get_data(as_text=True)
+        assert "allCardsDt" in res.get_data(as_text=True)
+
+    def test_get_cards_page(self, user, decks, card, login, client):
+        login()
+        cards = [
+            Card(front=f"F{i}", back="B", user_id=user.id, deck_id=decks[0].id)
+            for i in range(3)
+        ]
+        for new_card in cards:
+            new_card.save()
+        res = client.get("/cards/page?limit=2")
+        assert 200 == res.status_code
+        page = res.get_json()
+        assert [c["short_front"] for c in page["cards"]] == ["F2", "F1"]
+        assert "back" not in page["cards"][0], "Should not load card backs"
+
+        res = client.get(f"/cards/page?limit=2&cursor={page['next_cursor']}")
+        page = res.get_json()
+        assert [c["id"] for c in page["cards"]] == [cards[0].id, card.id]
+        assert page["next_cursor"] is None, "Should be the last page"
+
+        res = client.get(f"/cards/page?deck_id={card.deck_id}&state=Active")
+        assert [c["id"] for c in res.get_json()["cards"]] == [card.id]
+        assert 400 == client.get("/cards/page?cursor=spam").status_code
+
+    def test_search_cards(self, card, login, client):
+        login()
+        res = client.get("/cards/search?q=dynamic+programming")
+        assert 200 == res.status_code
+        assert [c["id"] for c in res.get_json()["cards"]] == [card.id]
+        assert res.get_json()["has_next"] is False
+        res = client.get("/cards/search?q=dynamic&page=2")
+        assert res.get_json()["cards"] == [], "Should paginate"
+
+    def test_get_due_cards(self, card, login, client):
+        login()
+        res = client.get(f"/cards/due?deck_id={card.deck_id}")
+        assert 200 == res.status_code
+        page = res.get_json()
+        assert [c["id"] for c in page["cards"]] == [card.id], "New card is due"
+        assert "back" not in page["cards"][0], "Should not load card backs"
+        for i in range(2):
+            Card(
+                front=f"F{i}", back="B", user_id=card.user_id, deck_id=card.deck_id
+            ).save()
+        res = client.get("/cards/due?limit=2")
+        page = res.get_json()
+        ids = [c["id"] for c in page["cards"]]
+        res = client.get(f"/cards/due?limit=2&cursor={page['next_cursor']}")
+        ids += [c["id"] for c in res.get_json()["cards"]]
+        assert len(ids) == 3 and len(set(ids)) == 3, "Should paginate"
+        assert res.get_json()["next_cursor"] is None, "Should be the last page"
 
     def test_create_deck(self, user, login, client):
         login()
@@ -108,6 +247,25 @@ class TestRoutes:
         assert res.status_code == 200
         assert "Algorythms", res.get_data(as_text=True)
 
+    def test_edit_deck_parent(self, decks, login, client):
+        login()
+        res = client.post(f"/deck/{decks[0].id}/edit", data={"parent_id": decks[1].id})
+        assert 400 == res.status_code, "Should reject moving a deck into its child"
+        assert Deck.query.get(decks[0].id).parent_id is None
+        res = client.post(f"/deck/{decks[0].id}/edit", data={"parent_id": decks[0].id})
+        assert 400 == res.status_code, "Should reject a deck as its own parent"
+        res = client.post(f"/deck/{decks[1].id}/edit", data={"parent_id": ""})
+        assert 200 == res.status_code
+        assert Deck.query.get(decks[1].id).parent_id is None
+
+    def test_decks_tree(self, decks, card, login, client):
+        login()
+        res = client.get("/decks/tree")
+        assert 200 == res.status_code
+        default, algos = res.get_json()
+        assert algos["subtree_card_count"] == 1 and algos["card_count"] == 0
+        assert [child["id"] for child in algos["children"]] == [decks[1].id]
+
     def test_delete_deck(self, decks, login, client):
         login()
         res = client.post(f"/deck/{decks[0].id}/delete")
@@ -124,13 +282,55 @@ class TestRoutes:
         )
         deck_1.save()
         deck_2.save()
+        child = Deck(name="Child", user_id=user.id, parent_id=deck_1.id)
+        child.save()
+        Card(front="Front", back="Back", user_id=user.id, deck_id=child.id).save()
+        deck_ids = [deck_1.id, deck_2.id, child.id]
         res = client.post(
             "/deck/bulk/delete",
-            data={"data": json.dumps([deck_1.id, deck_2.id])},
+            data={"data": json.dumps(deck_ids[:2])},
         )
         assert 200 == res.status_code, "Should return 200 status code"
-        assert Deck.query.filter_by(id=deck_1.id).first() is None
-        assert Deck.query.filter_by(id=deck_2.id).first() is None
+        assert res.get_json()["deleted"] == 2
+        assert Deck.query.filter(Deck.id.in_(deck_ids)).count() == 0, "Sub decks too"
+        assert Card.query.filter_by(deck_id=deck_ids[2]).count() == 0
+
+    def test_bulk_delete_decks_import_jobs(self, user, login, client):
+        login()
+        deck = Deck(name="Parent", user_id=user.id)
+        deck.save()
+        child = Deck(name="Child", user_id=user.id, parent_id=deck.id)
+        child.save()
+        job = ImportJob(user_id=user.id, deck_id=child.id, file_path="missing.csv")
+        db.session.add(job)
+        db.session.commit()
+        deck_id, child_id = deck.id, child.id
+        with foreign_keys():
+            res = client.post(
+                "/deck/bulk/delete", data={"data": json.dumps([deck_id])}
+            )
+        assert 200 == res.status_code, "Should delete the decks' import jobs too"
+        assert ImportJob.query.filter_by(deck_id=child_id).count() == 0
+
+    def test_bulk_delete_decks_deepest_first(self, user, login, client, monkeypatch):
+        login()
+        monkeypatch.setattr(models, "BULK_CHUNK_SIZE", 1)
+        parent_id = None
+        deck_ids = []
+        for name in ("Parent", "Child", "Grandchild"):
+            deck = Deck(name=name, user_id=user.id, parent_id=parent_id)
+            deck.save()
+            parent_id = deck.id
+            deck_ids.append(deck.id)
+        with foreign_keys():
+            res = client.post(
+                "/deck/bulk/delete",
+                data={"data": json.dumps([deck_ids[0], deck_ids[0], str(deck_ids[0])])},
+            )
+        assert 200 == res.status_code, "Should delete sub decks before parents"
+        assert res.get_json()["deleted"] == 1
+        assert res.get_json()["rejected"] == 0, "Duplicate ids aren't rejected"
+        assert Deck.query.filter(Deck.id.in_(deck_ids)).count() == 0
 
     def test_get_decks(self, login, decks, client):
         login()
@@ -190,7 +390,29 @@ class TestRoutes:
         res = client.post(f"/deck/{decks[1].id}/reset", data={"state": "solved"})
         assert 200 == res.status_code
         card = Card.query.filter_by(deck_id=decks[1].id).first()
-        assert card.state == "solved"
+        assert card.state == "Solved"
+        assert DeckStats.query.get(decks[1].id).solved_count == 1
+        res = client.get(f"/cards/page?deck_id={decks[1].id}&state=Solved")
+        assert [c["id"] for c in res.get_json()["cards"]] == [card.id]
+        client.post(f"/deck/{decks[1].id}/reset", data={"state": "active"})
+        res = client.get(f"/cards/page?deck_id={decks[1].id}&state=Active")
+        assert len(res.get_json()["cards"]) == 1, "Should filter reset cards"
+
+    def test_reset_deck_recursive(self, card, decks, study_session, login, client):
+        login()
+        study_session.update(state="Studying", known=1)
+        res = client.post(
+            f"/deck/{decks[0].id}/reset",
+            data={"state": "Active", "sessions": "reset"},
+        )
+        assert 400 == res.status_code, "Should only accept active or solved"
+        res = client.post(
+            f"/deck/{decks[0].id}/reset",
+            data={"state": "active", "sessions": "close"},
+        )
+        assert 200 == res.status_code
+        assert Card.query.get(card.id).state == "Active", "Should reset sub decks"
+        assert StudySession.query.get(study_session.id).state == "Complete"
 
     def test_study_deck(self, card, decks, login, client):
         login()
@@ -198,6 +420,14 @@ class TestRoutes:
         res = client.get(f"/deck/{decks[1].id}/study")
         assert 200 == res.status_code
 
+    def test_study_deck_subdecks(self, card, decks, login, client):
+        login()
+        res = client.get(f"/deck/{decks[0].id}/study?subdecks=true")
+        assert 200 == res.status_code
+        assert card.front in res.get_data(as_text=True), "Should study sub decks"
+        study_session = StudySession.query.filter_by(deck_id=decks[0].id).one()
+        assert study_session.include_subdecks
+
     def test_get_next_card(self, login, card, plan, decks, study_session, client):
         login()
         study_session.update(state="Studying")
@@ -222,6 +452,55 @@ class TestRoutes:
         res_data = res.get_json()
         assert res_data["status"] == 1, "Should return a valid next card"
 
+    def test_get_next_card_prefetch(self, login, card, decks, study_session, client):
+        login()
+        study_session.update(state="Studying", deck_id=decks[1].id)
+        for i in range(4):
+            Card(
+                front=f"F{i}", back="B", user_id=card.user_id, deck_id=decks[1].id
+            ).save()
+        res = client.post(
+            f"deck/{decks[1].id}/study/{study_session.id}/next",
+            data={"card_id": card.id, "state": "Known", "prefetch": 2},
+        )
+        res_data = res.get_json()
+        cards = res_data["data"]["cards"]
+        assert len(cards) == 3, "Should return the active card and two more"
+        assert cards[0] == res_data["data"]["active_card"]
+        assert card.id not in [c["id"] for c in cards], "Should skip answered cards"
+
+    def test_submit_study_answers(self, login, card, decks, study_session, client):
+        login()
+        study_session.update(state="Studying", deck_id=decks[1].id)
+        second_card = Card(
+            front="test front",
+            back="test back",
+            user_id=card.user_id,
+            deck_id=decks[1].id,
+        )
+        second_card.save()
+        answers = [
+            {"card_id": card.id, "state": "Known", "answered_at": "2021-02-16T11:47Z"},
+            {"card_id": card.id, "state": "Known"},
+        ]
+        res = client.post(
+            f"deck/{decks[1].id}/study/{study_session.id}/answers", json=answers
+        )
+        assert 200 == res.status_code
+        res_data = res.get_json()
+        assert res_data["data"]["active_study_session"]["known"] == 1, "No duplicates"
+        assert [c["id"] for c in res_data["data"]["cards"]] == [second_card.id]
+        res = client.post(
+            f"deck/{decks[1].id}/study/{study_session.id}/answers",
+            data={"data": json.dumps([{"card_id": second_card.id, "state": "Maybe"}])},
+        )
+        assert 400 == res.status_code, "Should reject invalid answers"
+        res = client.post(
+            f"deck/{decks[1].id}/study/{study_session.id}/answers",
+            data={"data": "not-json"},
+        )
+        assert 400 == res.status_code, "Should reject malformed data"
+
     def test_add_cards_to_deck(self, decks, login, client):
         login()
         res = client.get(f"/deck/{decks[1].id}/add-cards")
@@ -0,0 +1,28 @@
+import csv
+import gzip
+import io
+import json
+from flashlearn.exporter import export_cards, iter_chunks
+from flashlearn.models import Card
+
+
+class TestExporter:
+    def test_export_cards(self, user, decks, card):
+        Card(front="F,1", back='B "1"', user_id=user.id, deck_id=decks[0].id).save()
+        lines = b"".join(export_cards(user.id)).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [row["deck"] for row in rows] == ["DP", "Algorithms"]
+        assert rows[0]["front"] == card.front
+
+        data = b"".join(export_cards(user.id, "csv", deck_ids=[decks[0].id]))
+        rows = list(csv.DictReader(io.StringIO(data.decode())))
+        assert len(rows) == 1, "Should only export the given decks"
+        assert rows[0]["front"] == "F,1" and rows[0]["back"] == 'B "1"'
+
+    def test_export_cards_gzip(self, user, card):
+        data = b"".join(export_cards(user.id, compress=True))
+        assert json.loads(gzip.decompress(data))["id"] == card.id
+
+    def test_iter_chunks(self):
+        chunks = list(iter_chunks(["ab", "cd", "e"], write_size=3))
+        assert chunks == [b"abcd", b"e"]
@@ -0,0 +1,79 @@
+import io
+import json
+import pytest
+from flashlearn.importer import (
+    iter_json_array,
+    iter_ndjson,
+    import_cards,
+    run_import_job,
+)
+from flashlearn.models import Card, Deck, DeckStats, ImportJob
+
+
+class TestImporter:
+    def test_iter_json_array(self):
+        cards = [{"front": f"Front {i}", "back": "Back ✓"} for i in range(50)]
+        stream = io.BytesIO(json.dumps(cards).encode())
+        assert list(iter_json_array(stream, read_size=7)) == cards
+        assert list(iter_json_array(io.BytesIO(b" [ ] "))) == []
+
+        with pytest.raises(ValueError):
+            list(iter_json_array(io.BytesIO(b'[{"front": "a"}, {"fro')))
+        with pytest.raises(ValueError):
+            list(iter_json_array(io.BytesIO(b'{"front": "a"}')))
+        for malformed in (b"[1 2]", b"[1,,2]", b"[,1]", b"[1,]", b"[1] 2", b"[1"):
+            with pytest.raises(ValueError):
+                list(iter_json_array(io.BytesIO(malformed), read_size=2))
+
+    def test_iter_ndjson(self):
+        stream = io.BytesIO(b'{"front": "a", "back": "b"}\n\n{"front": "c"}\n')
+        assert list(iter_ndjson(stream)) == [
+            {"front": "a", "back": "b"},
+            {"front": "c"},
+        ]
+
+    def test_import_cards(self, user, decks):
+        items = [{"front": f"F{i}", "back": "B"} for i in range(5)]
+        items.insert(2, {"front": "No back"})
+        progress = list(import_cards(items, decks[0].id, user.id, chunk_size=2))
+        assert len(progress) == 3, "Should report progress after every chunk"
+        assert progress[-1]["done"] and progress[-1]["imported"] == 5
+        assert progress[-1]["errors"] == [{"row": 2, "error": "back is required"}]
+        assert Card.query.filter_by(deck_id=decks[0].id).count() == 5
+        assert DeckStats.query.get(decks[0].id).card_count == 5
+
+    def test_run_import_job(self, user, decks, tmp_path):
+        path = tmp_path / "cards.tsv"
+        path.write_text("Q\tA\tTopic\nF1\tB1\tGraphs\nF2\tB2\t\nF3\n")
+        job = ImportJob(
+            user_id=user.id,
+            deck_id=decks[0].id,
+            file_path=str(path),
+            delimiter="\t",
+            front_column="Q",
+            back_column="A",
+            deck_column="Topic",
+            has_header=True,
+            state="Running",
+        )
+        job.save()
+        run_import_job(job)
+        assert job.state == "Complete"
+        assert job.imported == 2 and job.failed == 1
+        assert job.to_json["errors"] == [{"row": 2, "error": "back is required"}]
+        assert not path.exists(), "Should remove the imported file"
+
+        graphs = Deck.query.filter_by(name="Graphs", parent_id=decks[0].id).one()
+        assert Card.query.filter_by(deck_id=graphs.id).count() == 1
+        assert DeckStats.query.get(decks[0].id).card_count == 1
+
+    def test_run_import_job_failure(self, user, decks, tmp_path):
+        job = ImportJob(
+            user_id=user.id,
+            deck_id=decks[0].id,
+            file_path=str(tmp_path / "missing.csv"),
+            state="Running",
+        )
+        job.save()
+        run_import_job(job)
+        assert job.state == "Failed" and job.message
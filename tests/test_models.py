@@ -1,5 +1,17 @@
+import pytest
+from datetime import datetime, timedelta
 from flask_bcrypt import Bcrypt
-from flashlearn.models import User, Card, Deck, StudyPlan, StudySession, StudySessionLog
+from flashlearn import db
+from flashlearn.enums import OrderTypeEnum
+from flashlearn.models import (
+    User,
+    Card,
+    Deck,
+    DeckStats,
+    StudyPlan,
+    StudySession,
+    StudySessionLog,
+)
 
 
 class TestModels:
@@ -88,3 +100,169 @@ class TestModels:
         assert (
             StudySessionLog.query.filter_by(id=study_session_log.id).first() is None
         ), "Should be deleted"
+
+    def test_deck_summaries(self, user, decks, card, study_session):
+        study_session.update(known=1, unknown=0)
+        decks[0].update(state="Studying")
+        summaries = {s["id"]: s for s in Deck.summaries(user.id)}
+        algos, dp = summaries[decks[0].id], summaries[decks[1].id]
+        assert algos["child_count"] == 1, "Algorithms should have one child deck"
+        assert dp["card_count"] == 1, "DP should have one card"
+        assert algos["stats"]["known"] == 1, "Should use the latest session's stats"
+        assert algos["stats"]["last_studied"], "Should set the last studied date"
+        assert decks[1].to_json == dp, "to_json should match the deck summary"
+
+    def test_deck_stats(self, user, decks, card):
+        stats = DeckStats.query.get(decks[1].id)
+        assert stats.card_count == 1, "Should count the saved card"
+        assert stats.active_count == 1, "The card should be counted as active"
+        assert DeckStats.query.get(decks[0].id).child_count == 1
+        card.update(state="Disabled")
+        assert stats.disabled_count == 1 and stats.active_count == 0
+        card.update(deck_id=decks[0].id)
+        assert DeckStats.query.get(decks[0].id).card_count == 1, "Should move card"
+        assert stats.card_count == 0, "Should remove card from its previous deck"
+        card.delete()
+        assert DeckStats.query.get(decks[0].id).card_count == 0
+        DeckStats.query.delete()
+        assert DeckStats.rebuild() == len(user.decks), "Should rebuild every deck"
+        assert DeckStats.query.get(decks[0].id).child_count == 1
+
+    def test_study_queue(self, user, decks, card, study_session):
+        older = Card(front="Older", back="Back", user_id=user.id, deck_id=decks[0].id)
+        older.save()
+        newer = Card(front="Newer", back="Back", user_id=user.id, deck_id=decks[0].id)
+        newer.save()
+        study_session.build_queue(OrderTypeEnum.latest)
+        queue = [item.card_id for item in study_session.queue]
+        assert queue == [newer.id, older.id], "Should queue cards latest first"
+        assert study_session.peek_card() == newer, "Should return the queue head"
+        study_session.dequeue(newer.id)
+        assert study_session.peek_card() == older, "Should pop the answered card"
+        study_session.dequeue(older.id)
+        assert study_session.peek_card() is None, "Should empty the queue"
+
+    def test_hot_query_indexes(self, user, decks, study_session):
+        def query_plan(query):
+            compiled = query.statement.compile(
+                dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}
+            )
+            rows = db.session.execute(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+            return " ".join(row[-1] for row in rows)
+
+        hot_queries = {
+            "ix_cards_user_id_deck_id_state_date_created": Card.query.filter(
+                Card.state == "Active",
+                Card.user_id == user.id,
+                Card.deck_id == decks[0].id,
+            ).order_by(Card.date_created),
+            "ix_study_session_logs_study_session_id_card_id": db.session.query(
+                StudySessionLog.card_id
+            ).filter_by(study_session_id=study_session.id),
+            "ix_study_sessions_user_id_deck_id_state_date_updated": (
+                StudySession.query.filter_by(
+                    deck_id=decks[0].id, user_id=user.id, state="Studying"
+                ).order_by(StudySession.date_updated.desc())
+            ),
+            "ix_study_plans_user_id_state_date_created": StudyPlan.query.filter_by(
+                user_id=user.id, state="Active"
+            ).order_by(StudyPlan.date_created.desc()),
+            "sqlite_autoindex_users_1": User.query.filter(
+                User.username == user.username
+            ),
+        }
+        for index, query in hot_queries.items():
+            assert index in query_plan(query), f"Should be planned with {index}"
+        assert "ix_cards_user_id" in query_plan(Card.query.filter_by(user_id=user.id))
+
+    def test_study_queue_shuffle(self, user, decks, study_session):
+        for i in range(20):
+            Card(front=f"F{i}", back="B", user_id=user.id, deck_id=decks[0].id).save()
+        study_session.build_queue(OrderTypeEnum.random)
+        queue = [item.card_id for item in study_session.queue]
+        assert study_session.seed, "Should seed the session's shuffle"
+        assert len(set(queue)) == 20, "Should queue every card exactly once"
+        study_session.build_queue(OrderTypeEnum.random)
+        db.session.expire(study_session, ["queue"])
+        assert queue == [i.card_id for i in study_session.queue], "Should reproduce"
+        # A multiplicative "shuffle" of consecutive ids keeps a constant stride
+        strides = {b - a for a, b in zip(queue, queue[1:])}
+        assert len(strides) > 3, "Shouldn't be an arithmetic progression of ids"
+        residues = [card_id % 7 for card_id in queue]
+        assert residues != sorted(residues), "Shouldn't be ordered by id residues"
+
+    def test_card_review(self, user, card):
+        assert card in Card.due(user.id).all(), "New cards should be due"
+        card.review("Known")
+        db.session.commit()
+        assert card.interval_days == 1, "Should schedule the next review in a day"
+        assert card not in Card.due(user.id, deck_id=card.deck_id).all()
+        card.review("Unknown", reviewed_at=datetime.utcnow() - timedelta(days=2))
+        db.session.commit()
+        assert card in Card.due(user.id).all(), "Forgotten cards should be due again"
+
+    def test_card_page(self, user, decks):
+        # Created within the same second, so pages are split on id ties
+        cards = [
+            Card(front=f"F{i}" * 30, back="B", user_id=user.id, deck_id=decks[i % 2].id)
+            for i in range(5)
+        ]
+        for card in cards:
+            card.save()
+        ids, cursor = [], None
+        while True:
+            rows, cursor = Card.page(user.id, cursor=cursor, limit=2)
+            ids += [row.id for row in rows]
+            if cursor is None:
+                break
+        assert ids == [card.id for card in reversed(cards)], "Should page newest first"
+        assert len(rows[0].short_front) == 50, "Should only load short fronts"
+
+        rows, cursor = Card.page(user.id, deck_id=decks[1].id)
+        assert [row.id for row in rows] == [cards[3].id, cards[1].id]
+        assert cursor is None
+
+    def test_deck_hierarchy(self, user, decks, card):
+        algos, dp = decks
+        leaf = Deck(name="Knapsack", user_id=user.id, parent_id=dp.id)
+        leaf.save()
+        Card(front="F", back="B", user_id=user.id, deck_id=leaf.id).save()
+
+        assert Deck.subtree_ids([algos.id]) == {algos.id, dp.id, leaf.id}
+        assert Deck.subtree_card_count(algos.id) == 2
+        tree = {node["name"]: node for node in Deck.tree(user.id)}
+        assert set(tree) == {"Default", "Algorithms"}, "Should nest sub decks"
+        dp_node = tree["Algorithms"]["children"][0]
+        assert dp_node["subtree_card_count"] == 2 and dp_node["card_count"] == 1
+        assert tree["Algorithms"]["subtree_deck_count"] == 3
+        assert dp_node["children"][0]["id"] == leaf.id
+        assert algos.children_to_json[0]["id"] == dp.id
+
+        with pytest.raises(ValueError):
+            algos.update(parent_id=leaf.id)
+        db.session.rollback()
+        leaf.update(parent_id=algos.id)
+        assert DeckStats.query.get(algos.id).child_count == 2
+
+    def test_study_queue_subdecks(self, user, decks, card, study_session):
+        study_session.build_queue()
+        assert [item.card_id for item in study_session.queue] == []
+        study_session.include_subdecks = True
+        study_session.build_queue()
+        db.session.expire(study_session, ["queue"])
+        assert [item.card_id for item in study_session.queue] == [card.id]
+
+    def test_deck_stats_subdeck_session(self, user, decks, card):
+        Card(front="F", back="B", user_id=user.id, deck_id=decks[0].id).save()
+        decks[0].update(state="Studying")
+        StudySession(
+            user_id=user.id, deck_id=decks[0].id, include_subdecks=True
+        ).save()
+        subtree_session = StudySession.query.filter_by(include_subdecks=True).one()
+        subtree_session.update(known=2, unknown=0)
+        for _ in range(2):
+            algos = {s["id"]: s for s in Deck.summaries(user.id)}[decks[0].id]
+            assert algos["card_count"] == 1
+            assert 0 <= algos["stats"]["progress"] <= 100, "Should not count sub decks"
+            assert algos["stats"]["remaining"] >= 0
+            DeckStats.rebuild()
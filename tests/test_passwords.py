@@ -0,0 +1,20 @@
+from flask_bcrypt import Bcrypt
+from flashlearn.passwords import check_password, hash_password, needs_rehash
+
+
+class TestPasswords:
+    def test_hash_password(self, test_app):
+        with test_app.app_context():
+            password_hash = hash_password("TheShrubbery@007")
+            assert password_hash.startswith("$2b$04$"), "Should use the config cost"
+            assert check_password("TheShrubbery@007", password_hash)
+            assert not check_password("Ni!", password_hash)
+            assert not check_password("Ni!", "not a hash")
+
+    def test_needs_rehash(self, test_app):
+        legacy = Bcrypt().generate_password_hash("TheShrubbery@007").decode()
+        with test_app.app_context():
+            assert check_password("TheShrubbery@007", legacy), "Should be compatible"
+            assert needs_rehash(legacy), "Should rehash other cost factors"
+            assert not needs_rehash(hash_password("TheShrubbery@007"))
+            assert needs_rehash("")
@@ -0,0 +1,48 @@
+import json
+import logging
+import pytest
+from flashlearn import create_app
+from flashlearn.query_stats import SLOWEST_STATEMENTS, QueryStats
+from instance.config import TestingConfig
+
+
+@pytest.fixture
+def test_app(monkeypatch):
+    monkeypatch.setattr(TestingConfig, "SQL_INSTRUMENTATION", True)
+    monkeypatch.setattr(TestingConfig, "SQL_INSTRUMENTATION_HEADERS", True)
+    return create_app("testing")
+
+
+class TestQueryStats:
+    def test_slowest(self):
+        stats = QueryStats()
+        for i in range(10):
+            stats.record(f"SELECT {i}", i / 1000)
+        assert stats.count == 10
+        assert stats.duration == pytest.approx(0.045)
+        assert [statement for _, statement in stats.slowest] == [
+            f"SELECT {i}" for i in range(9, 9 - SLOWEST_STATEMENTS, -1)
+        ], "Should keep the slowest statements, slowest first"
+
+    def test_headers(self, client, login, decks):
+        login()
+        res = client.get("/decks")
+        assert int(res.headers["X-Query-Count"]) > 0, "Should count queries"
+        assert res.headers["Server-Timing"].startswith("db;dur=")
+
+    def test_slow_request_log(self, test_app, client, login, decks, caplog):
+        login()
+        test_app.config["SLOW_REQUEST_QUERY_COUNT"] = 1
+        with caplog.at_level(logging.WARNING, logger="flashlearn"):
+            res = client.post(f"/deck/{decks[0].id}")
+        records = [r for r in caplog.records if r.msg == "Slow request %s"]
+        assert 1 == len(records), "Should log the slow request"
+        log_line = json.loads(records[0].args[0])
+        assert log_line["endpoint"] == "core.get_deck"
+        assert log_line["queries"] == int(res.headers["X-Query-Count"])
+        assert 0 < len(log_line["slowest"]) <= SLOWEST_STATEMENTS
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(TestingConfig, "SQL_INSTRUMENTATION", False)
+        res = create_app("testing").test_client().get("/user/login")
+        assert "X-Query-Count" not in res.headers, "Should be opt-in"
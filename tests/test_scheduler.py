@@ -0,0 +1,17 @@
+from flashlearn.scheduler import DEFAULT_EASE_FACTOR, MIN_EASE_FACTOR, sm2
+
+
+class TestScheduler:
+    def test_sm2_intervals(self):
+        schedule = (0, 0, DEFAULT_EASE_FACTOR)
+        intervals = []
+        for _ in range(3):
+            schedule = sm2(4, *schedule)
+            intervals.append(schedule[1])
+        assert intervals == [1, 6, 15], "Should grow intervals on each recall"
+        assert schedule[2] == DEFAULT_EASE_FACTOR, "Quality 4 keeps the ease factor"
+
+    def test_sm2_lapse(self):
+        repetitions, interval, ease_factor = sm2(1, 5, 30, MIN_EASE_FACTOR)
+        assert (repetitions, interval) == (0, 1), "Should restart after a lapse"
+        assert ease_factor == MIN_EASE_FACTOR, "Ease factor should not drop below min"
@@ -0,0 +1,48 @@
+from flashlearn import db
+from flashlearn.models import Card, Deck
+from flashlearn.search import fts5_query, rebuild_search_index, search_cards
+
+
+class TestSearch:
+    def test_fts5_query(self):
+        expected = '{front back} : ("dynamic" "prog"*) AND user_id : "7"'
+        assert fts5_query(["dynamic", "prog"], 7) == expected
+
+    def test_search_cards(self, user, super_user, decks, card):
+        other = Card(
+            front="Graphs",
+            back="Dynamic graphs change over time " + "edges and nodes " * 20,
+            user_id=user.id,
+            deck_id=decks[0].id,
+        )
+        other.save()
+        Card(
+            front="Dynamic", back="B", user_id=super_user.id, deck_id=decks[0].id
+        ).save()
+
+        rows, has_next = search_cards(user.id, "dynamic")
+        assert [row.id for row in rows] == [card.id, other.id], "Should rank matches"
+        assert not has_next
+        rows, has_next = search_cards(user.id, "dynamic", page=1, per_page=1)
+        assert [row.id for row in rows] == [card.id] and has_next, "Should paginate"
+        assert search_cards(user.id, "progr")[0][0].id == card.id, "Should prefix"
+        assert search_cards(user.id, "AND OR \" *") == ([], False)
+
+    def test_search_index_sync(self, user, decks, card):
+        card.update(front="Memoization")
+        assert [row.id for row in search_cards(user.id, "memoization")[0]] == [card.id]
+        assert search_cards(user.id, "what")[0] == [], "Should drop old fronts"
+
+        Card.bulk_delete([card.id], user.id)
+        assert search_cards(user.id, "memoization")[0] == [], "Should drop deleted"
+
+        db.session.execute(
+            Card.__table__.insert(),
+            [dict(front="Tries", back="B", user_id=user.id, deck_id=decks[0].id)],
+        )
+        db.session.commit()
+        assert len(search_cards(user.id, "tries")[0]) == 1, "Should index bulk adds"
+
+        Deck.bulk_delete([decks[0].id], user.id)
+        rebuild_search_index()
+        assert search_cards(user.id, "tries")[0] == [], "Should drop deck cards"
@@ -1,5 +1,12 @@
 import pytest
-from flashlearn.utils import to_bool
+from datetime import datetime, timezone
+from flashlearn.utils import (
+    chunks,
+    decode_cursor,
+    encode_cursor,
+    parse_datetime,
+    to_bool,
+)
 
 
 class TestUtils:
@@ -13,3 +20,24 @@ class TestUtils:
 
         with pytest.raises(ValueError):
             to_bool("a shrubbery!")
+
+    def test_parse_datetime(self):
+        expected = datetime(2021, 2, 16, 11, 47, 46, tzinfo=timezone.utc)
+        assert parse_datetime("2021-02-16T11:47:46Z") == expected, "Should parse UTC"
+        assert (
+            parse_datetime("2021-02-16T14:47:46+03:00") == expected
+        ), "Should convert offsets to UTC"
+        assert parse_datetime("2021-02-16T11:47:46").tzinfo == timezone.utc
+
+        with pytest.raises(ValueError):
+            parse_datetime("tis but a scratch")
+
+    def test_chunks(self):
+        assert list(chunks([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+    def test_cursor(self):
+        created = datetime(2021, 2, 16, 11, 47, 46)
+        assert decode_cursor(encode_cursor(created, 7)) == (created, 7)
+
+        with pytest.raises(ValueError):
+            decode_cursor("ni!")